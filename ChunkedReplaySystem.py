@@ -0,0 +1,204 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from frame_source import FrameSource
+from sinks import CsvSink, EventLogSink, WriteBehindSink
+
+
+def plan_segments(frame_count, segment_frames, overlap_frames):
+    # (start, core_start, stop): frames [core_start, stop) belong to the segment, [start, core_start) is the
+    # overlap it shares with the previous segment and only serves to stitch track IDs
+    segments = []
+    for core_start in range(0, frame_count, segment_frames):
+        start = max(0, core_start - overlap_frames)
+        segments.append((start, core_start, min(frame_count, core_start + segment_frames)))
+    return segments
+
+
+def track_segment(video_path, start, stop, weights, threads, config_path=None, roi_margin=None):
+    # Runs in a worker process with its own model and tracker. Returns the position of every frame and
+    # the detections of the segment as flat arrays (frame index, class, local track ID, xyxy).
+    import torch
+    from detector import load_detector
+    from TrackerSystem import ComponentTracker, frame_detections
+    from roi import RegionOfInterest
+
+    torch.set_num_threads(threads)
+    model = load_detector(weights=weights)
+    source = FrameSource(video_path, start, stop)
+    roi = None
+    predict_kwargs = {}
+    if roi_margin is not None:
+        zones = ComponentTracker(config_path)
+        roi = RegionOfInterest.from_zones(zones.worker_zones, zones.middle_line, roi_margin, source.width, source.height)
+        predict_kwargs['imgsz'] = roi.imgsz()
+
+    positions, frames, cls_ids, obj_ids, boxes = [], [], [], [], []
+    try:
+        for frame_idx, frame in source:
+            positions.append(source.position_ms(frame_idx))
+            view = roi.crop(frame) if roi is not None else frame
+            result = model.track(view, persist=True, tracker="botsort.yaml", verbose=False, **predict_kwargs)[0]
+            cls, ids, xyxy = frame_detections(result)
+            if roi is not None:
+                xyxy = roi.to_frame(xyxy)
+            frames.append(np.full(len(ids), frame_idx))
+            cls_ids.append(cls)
+            obj_ids.append(ids)
+            boxes.append(xyxy)
+    finally:
+        source.release()
+    if not frames:
+        return np.empty(0), np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty((0, 4), dtype=int)
+    return (np.asarray(positions), np.concatenate(frames), np.concatenate(cls_ids), np.concatenate(obj_ids),
+            np.concatenate(boxes))
+
+
+def box_ious(a, b):
+    a = np.asarray(a, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float64).reshape(-1, 4)
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.maximum(0, ix2 - ix1) * np.maximum(0, iy2 - iy1)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(union > 0, inter / union, 0.0)
+
+
+def match_tracks(previous, current, overlap, min_iou=0.5):
+    # previous / current: (frames, cls, ids, xyxy) of two neighbouring segments. A current track is the
+    # previous track it overlaps best on average over the overlap frames it appears in (same class only,
+    # one to one, greedily by mean IoU).
+    totals = {}
+    seen = {}
+    prev_frames, prev_cls, prev_ids, prev_xyxy = previous
+    cur_frames, cur_cls, cur_ids, cur_xyxy = current
+    for frame_idx in range(*overlap):
+        p = prev_frames == frame_idx
+        c = cur_frames == frame_idx
+        for cur_id in cur_ids[c].tolist():
+            seen[cur_id] = seen.get(cur_id, 0) + 1
+        if not p.any() or not c.any():
+            continue
+        ious = box_ious(cur_xyxy[c], prev_xyxy[p])
+        ious[cur_cls[c][:, None] != prev_cls[p][None, :]] = 0.0
+        for i, j in zip(*np.nonzero(ious)):
+            key = (int(cur_ids[c][i]), int(prev_ids[p][j]))
+            totals[key] = totals.get(key, 0.0) + ious[i, j]
+
+    mapping = {}
+    used = set()
+    for (cur_id, prev_id), total in sorted(totals.items(), key=lambda item: -item[1] / seen[item[0][0]]):
+        if total / seen[cur_id] < min_iou:
+            break
+        if cur_id not in mapping and prev_id not in used:
+            mapping[cur_id] = prev_id
+            used.add(prev_id)
+    return mapping
+
+
+def stitch(segments, results, min_iou=0.5):
+    # Gives every track one global ID across segments and keeps each segment's detections for its own
+    # frames only. Returns (frames, cls, ids, xyxy) for the whole video, ordered by frame.
+    next_id = 0
+    previous = None
+    parts = []
+    stitched = 0
+    for (start, core_start, stop), (_, frames, cls_ids, obj_ids, xyxy) in zip(segments, results):
+        mapping = {}
+        if previous is not None:
+            mapping = match_tracks(previous, (frames, cls_ids, obj_ids, xyxy), (start, core_start), min_iou)
+            stitched += len(mapping)
+        global_ids = np.empty(len(obj_ids), dtype=int)
+        for local_id in np.unique(obj_ids).tolist():
+            if local_id not in mapping:
+                mapping[local_id] = next_id
+                next_id += 1
+            global_ids[obj_ids == local_id] = mapping[local_id]
+        previous = (frames, cls_ids, global_ids, xyxy)
+        core = frames >= core_start
+        parts.append((frames[core], cls_ids[core], global_ids[core], xyxy[core]))
+    frames, cls_ids, obj_ids, xyxy = (np.concatenate(column) for column in zip(*parts))
+    return (frames, cls_ids, obj_ids, xyxy.reshape(-1, 4)), stitched
+
+
+def replay(tracker, segments, results, detections, origin):
+    # Feeds the stitched detections through one ComponentTracker in frame order, stamped like timed_frames
+    frames, cls_ids, obj_ids, xyxy = detections
+    bounds = np.searchsorted(frames, np.arange(segments[-1][2] + 1))
+    position = 0.0
+    for (start, core_start, stop), result in zip(segments, results):
+        positions = result[0]
+        for frame_idx in range(core_start, stop):
+            position = max(position, positions[frame_idx - start])
+            frame_time = origin + timedelta(milliseconds=position)
+            lo, hi = bounds[frame_idx], bounds[frame_idx + 1]
+            tracker.expire(frame_time)
+            tracker.update_frame(cls_ids[lo:hi], obj_ids[lo:hi], xyxy[lo:hi], frame_time)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Reprocess a recording in overlapping segments across a process pool "
+                                                 "and stitch the tracks back together.")
+    parser.add_argument("--video", default="videos/second_run_right 1.mp4", help="input video")
+    parser.add_argument("--config", default="second-zone-setup.json", help="zone config JSON")
+    parser.add_argument("--weights", default=None, help="model file (default: the backend from detector_config.json)")
+    parser.add_argument("--segment-seconds", type=float, default=60.0)
+    parser.add_argument("--overlap-seconds", type=float, default=2.0,
+                        help="video shared by neighbouring segments, used to match their track IDs")
+    parser.add_argument("--min-iou", type=float, default=0.5, help="mean IoU over the overlap needed to join two tracks")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--roi-margin", type=int, default=None, metavar="PX",
+                        help="run the detector only on the worker zones + middle line, grown by PX pixels")
+    parser.add_argument("--origin", type=datetime.fromisoformat, default=None,
+                        help="wall-clock time of the video's first frame (default: when the run starts)")
+    parser.add_argument("--boxes", default="boxes.csv")
+    parser.add_argument("--components", default="main_components.csv")
+    parser.add_argument("--binary", action="store_true", help="write binary event logs (.trk) instead of CSV")
+    return parser.parse_args()
+
+
+def main():
+    from TrackerSystem import ComponentTracker
+
+    args = parse_args()
+    origin = datetime.now() if args.origin is None else args.origin
+    source = FrameSource(args.video)
+    fps, frame_count = source.fps, source.frame_count
+    source.release()
+    if fps <= 0 or frame_count <= 0:
+        raise ValueError(f"{args.video} reports no frame rate / frame count, it can't be split into segments")
+
+    segments = plan_segments(frame_count, max(1, round(args.segment_seconds * fps)), round(args.overlap_seconds * fps))
+    workers = max(1, min(args.workers, len(segments)))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"🎞️ {frame_count} frames in {len(segments)} segments over {workers} workers")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(track_segment, args.video, start, stop, args.weights, threads, args.config, args.roi_margin)
+                   for start, _, stop in segments]
+        results = [future.result() for future in futures]
+
+    # Segments can come back a frame short when the container's frame count is off
+    decoded = [start + len(result[0]) for (start, _, _), result in zip(segments, results)]
+    segments = [(start, min(core_start, stop), stop) for (start, core_start, _), stop in zip(segments, decoded)]
+    detections, stitched = stitch(segments, results, args.min_iou)
+
+    target = EventLogSink(args.boxes, args.components) if args.binary else CsvSink(args.boxes, args.components)
+    tracker = ComponentTracker(args.config, track_ttl=60, dedup_window=600, flush_rows=200, flush_interval=1,
+                               sink=WriteBehindSink(target, os.path.splitext(args.boxes)[0] + "_spool.jsonl"))
+    replay(tracker, segments, results, detections, origin)
+    tracker.save_to_csv()
+    print(f"✅ {len(np.unique(detections[2]))} tracks ({stitched} joined across segments) saved as "
+          f"'{args.boxes}' / '{args.components}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,67 @@
-import pandas as pd
+import argparse
 
-boxes = pd.read_csv("mock_data_boxes.csv", parse_dates=["first_detected"])
-components = pd.read_csv("mock_data_components.csv", parse_dates=["first_detected"])
-barcodes = pd.read_csv("mock_data_reader.csv", parse_dates=["time_of_detection"])
+from barcode_join import BarcodeJoiner, MissingColumnError, RecordWriter, follow_csv, join_streams, read_chunks
 
-boxes = boxes.sort_values("first_detected").reset_index(drop=True)
-components = components.sort_values("first_detected").reset_index(drop=True)
-barcodes = barcodes.sort_values("time_of_detection").reset_index(drop=True)
 
-if len(boxes) > len(barcodes):
-    print(f"⚠️ More boxes ({len(boxes)}) than total barcodes ({len(barcodes)})!")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Match barcode reads to tracked boxes and components by time")
+    # .csv or .parquet (Parquet needs pyarrow)
+    parser.add_argument("--boxes", default="mock_data_boxes.csv")
+    parser.add_argument("--components", default="mock_data_components.csv")
+    parser.add_argument("--reader", default="mock_data_reader.csv")
+    parser.add_argument("--output", default="final_merged_output.csv")
+    parser.add_argument("--box-time", default="zone_entry_time", help="boxes column with the time a box is scanned")
+    parser.add_argument("--component-time", default="first_detected",
+                        help="components column with the time a component is scanned (e.g. line_touch_time)")
+    parser.add_argument("--tolerance", type=float, default=5.0, help="max seconds between a scan and its event")
+    parser.add_argument("--direction", choices=("nearest", "backward", "forward"), default="nearest",
+                        help="nearest read, last read before, or first read after the event")
+    parser.add_argument("--reader-offset", type=float, default=0.0,
+                        help="seconds added to reader timestamps to line its clock up with the cameras")
+    parser.add_argument("--lateness", type=float, default=300.0,
+                        help="seconds boxes/components may arrive out of first_detected order (the tracker writes "
+                             "rows of tracks that stay in view up to its max_hold, 300 s, late)")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--follow", action="store_true",
+                        help="keep tailing the reader and tracker CSVs as scans and tracked rows come in")
+    parser.add_argument("--idle-timeout", type=float, default=None, help="stop following after this many idle seconds")
+    return parser.parse_args()
 
-box_barcodes = barcodes.iloc[:len(boxes)].reset_index(drop=True)
-component_barcodes = barcodes.iloc[len(boxes):len(boxes)+len(components)].reset_index(drop=True)
 
-if len(components) > len(component_barcodes):
-    print(f"⚠️ More components ({len(components)}) than available component barcodes ({len(component_barcodes)})!")
+def main():
+    args = parse_args()
+    joiner = BarcodeJoiner(args.tolerance, args.direction, args.reader_offset)
 
-final_df = pd.DataFrame({
-    "box_id": boxes["box_id"],
-    "box_barcode": box_barcodes["barcode"],
-    "component_id": components["component_id"].astype("Int64") if len(components) else pd.Series(dtype="Int64"),
-    "component_barcode": component_barcodes["barcode"] if len(component_barcodes) else pd.Series(dtype="object")
-})
+    def read(path, time_columns):
+        # While following, every input is tailed, so the watermark moves on as the tracker writes more rows
+        if args.follow:
+            return follow_csv(path, time_columns, idle_timeout=args.idle_timeout)
+        return read_chunks(path, time_columns, args.chunksize)
 
-def classify(row):
-    if pd.isna(row["component_id"]): return "No component"
-    if pd.isna(row["component_barcode"]): return "No component barcode"
-    return "OK"
+    boxes = read(args.boxes, ["first_detected", args.box_time])
+    components = read(args.components, ["first_detected", args.component_time])
+    reads = read(args.reader, ["time_of_detection"])
 
-final_df["status"] = final_df.apply(classify, axis=1)
+    # Records are appended as soon as they are final, so the output grows while a shift is running
+    with RecordWriter(args.output) as writer:
+        try:
+            for records in join_streams(joiner, boxes, components, reads, args.box_time, args.component_time,
+                                        lateness=args.lateness):
+                writer.write(records)
+        except MissingColumnError as e:
+            raise SystemExit(f"❌ {e}; choose the scan time with --box-time / --component-time")
+    written = writer.rows
 
-final_df.to_csv("final_merged_output.csv", index=False)
-print("✅ Final CSV with status saved as 'final_merged_output.csv'")
+    stats = joiner.stats()
+    if stats["unmatched_entities"]:
+        print(f"⚠️ {stats['unmatched_entities']} boxes/components had no barcode read within {args.tolerance}s")
+    if stats["late_entities"]:
+        print(f"⚠️ {stats['late_entities']} boxes/components arrived too far out of order to be matched reliably; "
+              f"raise --lateness")
+    if stats["unmatched_reads"]:
+        print(f"⚠️ {stats['unmatched_reads']} barcode reads matched no box or component")
+    print(f"✅ {written} records ({stats['matched']} matched) saved as '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
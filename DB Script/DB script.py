@@ -1,38 +1,40 @@
+import os
+import sys
 import pyodbc
 from datetime import datetime
 
-# Connect to your SQL Server
-conn = pyodbc.connect(
-    'DRIVER={ODBC Driver 17 for SQL Server};'
-    'SERVER=YOUR_SERVER_NAME;'
-    'DATABASE=YOUR_DATABASE_NAME;'
-    'UID=YOUR_USERNAME;'
-    'PWD=YOUR_PASSWORD'
-)
-cursor = conn.cursor()
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from db_pool import get_pool, load_db_config
+
+# Connection settings come from db_pool.DB_CONFIG / db_config.json / TRACKER_DB_* environment variables
+config = load_db_config()
+pool = get_pool(config)
+
+# Inserts are grouped into transactions of commit_every rows instead of one commit per row
+batch = pool.batch(config["commit_every"])
 
 # Insert box record
 def insert_box(unique_id, timestamp, barcode):
     try:
-        cursor.execute(
+        batch.execute(
             "INSERT INTO Boxes (UniqueID, TimeAtLocation1, Barcode) VALUES (?, ?, ?)",
             unique_id, timestamp, barcode
         )
-        conn.commit()
     except pyodbc.IntegrityError:
         print(f"[!] Box {unique_id} already exists. Skipping.")
 
 # Insert item record
 def insert_item(unique_id, box_id, timestamp, barcode):
     try:
-        cursor.execute(
+        batch.execute(
             "INSERT INTO Items (UniqueID, BoxID, TimeAtLocation2, Barcode) VALUES (?, ?, ?, ?)",
             unique_id, box_id, timestamp, barcode
         )
-        conn.commit()
     except pyodbc.IntegrityError:
         print(f"[!] Item {unique_id} already exists or BoxID {box_id} invalid.")
 
 # Example usage (from your YOLO/Roboflow pipeline):
 insert_box("box_001", datetime.now(), "BOX123456")
 insert_item("item_001", "box_001", datetime.now(), "ITEM987654")
+batch.commit()
+pool.close()
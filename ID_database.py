@@ -1,43 +1,31 @@
 from ultralytics import YOLO
 import cv2
-import pyodbc
+import time
 from datetime import datetime
+from frame_source import FrameSource, track_frames
+from db_writer import BulkWriter, SqlServerBackend
+from db_pool import get_pool
 
-# --- Connect to SQL Server ---
-conn = pyodbc.connect(
-    'DRIVER={ODBC Driver 17 for SQL Server};'
-    'SERVER= database host;'
-    'DATABASE= database name;' 
-    'Trusted_Connection=yes;'
-)
-cursor = conn.cursor()
+# --- SQL Server connections come from the shared pool (settings: db_pool.DB_CONFIG / db_config.json) ---
+pool = get_pool()
+
+# --- Batched writer: rows are staged and inserted with one MERGE per table, committed every FLUSH_ROWS ---
+# --- distinct IDs or FLUSH_SECONDS, whichever comes first (a few hundred IDs would otherwise wait for the end) ---
+FLUSH_ROWS = 5000
+FLUSH_SECONDS = 5.0
+writer = BulkWriter()
+writer.register("Boxes", ["UniqueID", "TimeAtLocation1"], key="UniqueID", update=False)
+writer.register("Items", ["UniqueID", "BoxID", "TimeAtLocation2"], key="UniqueID", update=False)
 
 # --- Load YOLO model ---
 model = YOLO("runs/detect/train5/weights/best.pt")
 
-results = model.track(
-    source="second_run_right.mp4",
-    show=False,
-    stream=True,
-    tracker="botsort.yaml",
-    conf=0.5
-)
-
-# --- Prepare video ---
-cap = cv2.VideoCapture("second_run_right.mp4")
-frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-fps = cap.get(cv2.CAP_PROP_FPS)
-
-out = cv2.VideoWriter("output_tracked.mp4", cv2.VideoWriter_fourcc(*'mp4v'), fps, (frame_width, frame_height))
-
-frame_id = 0
-
-for result in results:
-    success, frame = cap.read()
-    if not success:
-        break
+# --- Prepare video (decoded once, shared by the tracker and the writer) ---
+source = FrameSource("second_run_right.mp4")
+out = source.open_writer("output_tracked.mp4")
+last_flush = time.monotonic()
 
+for frame_id, frame, result in track_frames(model, source, tracker="botsort.yaml", conf=0.5):
     if result.boxes is not None:
         for box in result.boxes:
             cls = int(box.cls[0].item())
@@ -53,27 +41,21 @@ for result in results:
             # Current timestamp
             timestamp = datetime.now()
 
-            # Insert into database
+            # Stage for the database (insert-only: the first sighting of an ID wins)
             if cls == 0:
                 # It's a box
-                cursor.execute("""
-                    IF NOT EXISTS (SELECT 1 FROM Boxes WHERE UniqueID = ?)
-                    INSERT INTO Boxes (UniqueID, TimeAtLocation1)
-                    VALUES (?, ?)
-                """, obj_id, obj_id, timestamp)
+                writer.add("Boxes", (obj_id, timestamp))
             else:
                 # It's a component
-                cursor.execute("""
-                    IF NOT EXISTS (SELECT 1 FROM Items WHERE UniqueID = ?)
-                    INSERT INTO Items (UniqueID, BoxID, TimeAtLocation2)
-                    VALUES (?, ?, ?)
-                """, obj_id, None, timestamp)  # Add logic for BoxID assignment if needed
+                writer.add("Items", (obj_id, None, timestamp))  # Add logic for BoxID assignment if needed
 
     out.write(frame)
-    frame_id += 1
-    conn.commit()
+    pending = writer.pending_rows()
+    if pending >= FLUSH_ROWS or (pending and time.monotonic() - last_flush >= FLUSH_SECONDS):
+        pool.run(lambda conn: writer.flush(SqlServerBackend(conn)))
+        last_flush = time.monotonic()
 
-cap.release()
+pool.run(lambda conn: writer.flush(SqlServerBackend(conn)))
+source.release()
 out.release()
-cursor.close()
-conn.close()
+pool.close()
@@ -0,0 +1,125 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import pandas as pd
+
+from recorder import RENDER_MODES
+
+
+def load_cameras(path):
+    with open(path) as f:
+        cameras = json.load(f)["cameras"]
+    ids = [camera["camera_id"] for camera in cameras]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Duplicate camera_id in {path}")
+    return cameras
+
+
+def camera_paths(output_dir, camera_id):
+    return {
+        "boxes": os.path.join(output_dir, f"boxes_{camera_id}.csv"),
+        "components": os.path.join(output_dir, f"main_components_{camera_id}.csv"),
+        "video": os.path.join(output_dir, f"annotated_{camera_id}.mp4"),
+    }
+
+
+def camera_origin(camera):
+    # Optional "origin" (ISO time of the video's first frame) makes a camera's timestamps reproducible
+    origin = camera.get("origin")
+    return datetime.fromisoformat(origin) if origin else None
+
+
+def run_camera(camera, output_dir, render, threads, idle_every=1, roi_margin=None):
+    # Runs in a worker process: one ComponentTracker and one pipeline per stream
+    import torch
+    from TrackerSystem import run_tracking
+
+    torch.set_num_threads(threads)
+    paths = camera_paths(output_dir, camera["camera_id"])
+    pipeline = run_tracking(camera["video"], camera["config"], paths["video"], render=render,
+                            boxes_path=paths["boxes"], components_path=paths["components"], idle_every=idle_every,
+                            roi_margin=roi_margin, origin=camera_origin(camera))
+    return camera["camera_id"], paths, [s.as_dict() for s in pipeline.stats]
+
+
+def run_shared(cameras, output_dir, render, batch_size, max_wait, idle_every=1, roi_margin=None):
+    # One process, one model: every stream's pipeline submits frames to a shared BatchScheduler
+    from detector import load_detector
+    from inference_scheduler import BatchScheduler
+    from TrackerSystem import run_tracking
+
+    def run_one(camera):
+        paths = camera_paths(output_dir, camera["camera_id"])
+        pipeline = run_tracking(camera["video"], camera["config"], paths["video"], render=render,
+                                boxes_path=paths["boxes"], components_path=paths["components"],
+                                scheduler=scheduler, stream_id=camera["camera_id"], idle_every=idle_every,
+                                roi_margin=roi_margin, origin=camera_origin(camera))
+        return camera["camera_id"], paths, [s.as_dict() for s in pipeline.stats]
+
+    with BatchScheduler(load_detector(), batch_size, max_wait) as scheduler:
+        with ThreadPoolExecutor(max_workers=len(cameras)) as pool:
+            for future in as_completed([pool.submit(run_one, camera) for camera in cameras]):
+                yield future.result()
+    print(f"🧮 Shared inference: {scheduler.stats()}")
+
+
+def run_pool(cameras, output_dir, render, workers, idle_every=1, roi_margin=None):
+    workers = max(1, min(workers, len(cameras)))
+    # Split the cores between streams so the per-process torch pools don't oversubscribe the CPU
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_camera, camera, output_dir, render, threads, idle_every, roi_margin) for camera in cameras]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def merge_outputs(results, output_dir):
+    # Per-camera CSVs are read back as text so values are written out exactly as the trackers produced them
+    for table, name in (("boxes", "boxes.csv"), ("components", "main_components.csv")):
+        frames = []
+        for camera_id, paths in results:
+            df = pd.read_csv(paths[table], dtype=str, keep_default_na=False)
+            df.insert(0, "camera_id", camera_id)
+            frames.append(df)
+        merged_path = os.path.join(output_dir, name)
+        pd.concat(frames, ignore_index=True).to_csv(merged_path, index=False)
+        print(f"✅ Merged {len(frames)} cameras into {merged_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one ComponentTracker per camera stream over a process pool.")
+    parser.add_argument("--cameras", default="cameras.json", help="JSON list of camera_id / video / config")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--output-dir", default="multi_camera_output")
+    parser.add_argument("--render", choices=RENDER_MODES, default="none")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="above 1, run all streams in one process with a shared, batched detector")
+    parser.add_argument("--max-wait-ms", type=float, default=20, help="longest wait for a shared batch to fill")
+    parser.add_argument("--cadence", type=int, default=1,
+                        help="while a camera's scene is static, run its detector only every Nth frame")
+    parser.add_argument("--roi-margin", type=int, default=None, metavar="PX",
+                        help="run each camera's detector only on its worker zones + middle line, grown by PX pixels")
+    args = parser.parse_args()
+
+    cameras = load_cameras(args.cameras)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.batch_size > 1:
+        runs = run_shared(cameras, args.output_dir, args.render, args.batch_size, args.max_wait_ms / 1000, args.cadence,
+                          args.roi_margin)
+    else:
+        runs = run_pool(cameras, args.output_dir, args.render, args.workers, args.cadence, args.roi_margin)
+
+    results = {}
+    for camera_id, paths, stats in runs:
+        results[camera_id] = paths
+        print(f"📷 {camera_id} done: " + ", ".join(f"{s['stage']} {s['fps']} fps" for s in stats))
+
+    merge_outputs([(camera["camera_id"], results[camera["camera_id"]]) for camera in cameras], args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
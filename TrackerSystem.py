@@ -1,8 +1,23 @@
+import argparse
+import os
 import cv2
-import pandas as pd
-from ultralytics import YOLO
+import numpy as np
 import json
-from datetime import datetime
+import heapq
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from event_buffer import ColumnarBuffer
+from sinks import CsvSink, DbSink, EventLogSink, WriteBehindSink
+from pipeline import Pipeline
+from frame_source import FrameSource, FrameSync
+from recorder import FrameRecorder, RENDER_MODES
+from inference_scheduler import BatchScheduler
+from cadence import AdaptiveCadence
+from roi import RegionOfInterest
+from barcode_stage import BarcodeStage
+from detector import load_detector
+from metrics import NULL_METRICS, JsonFileExporter, MetricsRegistry, PrometheusExporter
 
 def box_area(box):
     x1, y1, x2, y2 = box
@@ -22,55 +37,209 @@ def is_box_in_zone(box, zone, threshold=0.9):
     inter = intersection_area(box, zone)
     return area > 0 and (inter / area) >= threshold
 
+# Batched versions of the helpers above, for all detections of a frame at once.
+# box_area / intersection_area / is_box_in_zone stay as the per-detection reference.
+def zone_overlap_ratios(boxes, zones):
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    zones = np.asarray(zones, dtype=np.int64).reshape(-1, 4)
+    areas = np.maximum(0, boxes[:, 2] - boxes[:, 0]) * np.maximum(0, boxes[:, 3] - boxes[:, 1])
+    ix1 = np.maximum(boxes[:, None, 0], zones[None, :, 0])
+    iy1 = np.maximum(boxes[:, None, 1], zones[None, :, 1])
+    ix2 = np.minimum(boxes[:, None, 2], zones[None, :, 2])
+    iy2 = np.minimum(boxes[:, None, 3], zones[None, :, 3])
+    inter = np.maximum(0, ix2 - ix1) * np.maximum(0, iy2 - iy1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(areas[:, None] > 0, inter / areas[:, None], 0.0)
+
+def boxes_in_zones(boxes, zones, threshold=0.9):
+    return zone_overlap_ratios(boxes, zones) >= threshold
+
+def box_centroids(boxes):
+    boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) // 2, (boxes[:, 1] + boxes[:, 3]) // 2], axis=1)
+
+def line_sides(points, line):
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    (x1, y1), (x2, y2) = line
+    return (x2 - x1) * (points[:, 1] - y1) - (y2 - y1) * (points[:, 0] - x1) > 0
+
+def frame_detections(result):
+    # One device->host copy per tensor instead of per-box .item() calls
+    boxes = result.boxes if result is not None else None
+    if boxes is None or boxes.id is None:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty((0, 4), dtype=int)
+    return (boxes.cls.cpu().numpy().astype(int),
+            boxes.id.cpu().numpy().astype(int),
+            boxes.xyxy.cpu().numpy().astype(int))
+
 class ComponentTracker:
-    def __init__(self, config_path):
+    def __init__(self, config_path, track_ttl=None, max_tracks=None, dedup_window=None, sink=None, flush_rows=1000,
+                 flush_interval=None, barcodes=False, metrics=NULL_METRICS, max_hold=300):
         self.load_config(config_path)
+        self.metrics = metrics
+        metrics.gauge_fn('tracker_active_tracks', lambda: len(self.boxes))
         self.components = {}
-        self.boxes = {}
+        # Ordered by last sighting, so the least recently seen box is always first
+        self.boxes = OrderedDict()
         self.zone_boxes = {tuple(tuple(coord) for coord in zone): None for zone in self.worker_zones}
-        self.boxes_df = pd.DataFrame(columns=['box_id', 'first_detected', 'zone_id', 'zone_entry_time'])
-        self.components_df = pd.DataFrame(columns=['component_id', 'box_id', 'first_detected', 'assignment_method'])
-        self.processed_components = set()
-        self.processed_boxes = set()
+        self.box_events = ColumnarBuffer(['box_id', 'first_detected', 'zone_id', 'zone_entry_time'], key='box_id')
+        # With barcodes, component rows get a barcode column and are held back until their read is settled
+        self.barcodes = barcodes
+        self.barcode_pending = set()
+        self.component_events = ColumnarBuffer(['component_id', 'box_id', 'first_detected', 'assignment_method'] +
+                                               (['barcode'] if barcodes else []),
+                                               key='component_id' if barcodes else None)
+        # ID -> last sighting, pruned after dedup_window seconds (kept forever when None)
+        self.processed_components = OrderedDict()
+        self.processed_boxes = OrderedDict()
+        # Boxes currently inside each zone (with a lazy min-heap of them by order), and a lazy max-heap of
+        # boxes whose last zone entry was that zone
+        self.zone_members = [set() for _ in self.worker_zones]
+        self.zone_queue = [[] for _ in self.worker_zones]
+        self.zone_history = [[] for _ in self.worker_zones]
+        self.box_order = 0
+        # Zone entries + component assignments recorded so far, used to spot frames worth auditing
+        self.event_count = 0
+
+        # Eviction policy: drop boxes unseen for track_ttl seconds or beyond max_tracks (LRU).
+        # With a sink, finished rows are written out and released instead of kept until save_to_csv. They
+        # leave in first-detection order, as save_to_csv writes them: a box row waits for every box detected
+        # before it to be evicted, a component row for every earlier one still waiting for its barcode. A
+        # finished row waits at most max_hold seconds after its first detection, so a track that stays in view
+        # can't hold the rest back indefinitely; past that, rows are written out of order (barcode_join's
+        # lateness restores it).
+        self.track_ttl = timedelta(seconds=track_ttl) if track_ttl is not None else None
+        self.max_tracks = max_tracks
+        self.dedup_window = timedelta(seconds=dedup_window) if dedup_window is not None else None
+        self.sink = sink
+        self.flush_rows = flush_rows
+        self.flush_interval = timedelta(seconds=flush_interval) if flush_interval is not None else None
+        self.max_hold = timedelta(seconds=max_hold)
+        self.last_flush = None
+        self.held_rows = 0
+
+    @property
+    def boxes_df(self):
+        return self.box_events.to_frame()
+
+    @property
+    def components_df(self):
+        return self.component_events.to_frame()
 
     def load_config(self, config_path):
         with open(config_path) as f:
             config = json.load(f)
         self.worker_zones = [tuple(map(tuple, zone)) for zone in config["worker_zones"]]
         self.middle_line = [tuple(point) for point in config["middle_line"]]
+        self.zone_rects = [(x1, y1, x2, y2) for (x1, y1), (x2, y2) in self.worker_zones]
+        self.zone_sides = [self.get_side(((x1 + x2) // 2, (y1 + y2) // 2)) for x1, y1, x2, y2 in self.zone_rects]
 
-    def update_boxes(self, box_id, box_coords, centroid, timestamp):
+    def update_boxes(self, box_id, box_coords, centroid, timestamp, side=None, in_zones=None):
+        if side is None:
+            side = self.get_side(centroid)
         if box_id not in self.boxes:
             self.boxes[box_id] = {
                 'first_detected': timestamp,
                 'last_seen': timestamp,
                 'centroid': centroid,
                 'coords': box_coords,
-                'side': self.get_side(centroid),
+                'side': side,
                 'zone_entry_time': None,
-                'zone_id': None
+                'zone_id': None,
+                'order': self.box_order
             }
+            self.box_order += 1
             if box_id not in self.processed_boxes:
-                self.boxes_df = pd.concat([self.boxes_df, pd.DataFrame([{
+                self.box_events.append({
                     'box_id': box_id,
                     'first_detected': timestamp,
                     'zone_id': None,
                     'zone_entry_time': None
-                }])], ignore_index=True)
-                self.processed_boxes.add(box_id)
+                })
         else:
             self.boxes[box_id].update({
                 'last_seen': timestamp,
                 'centroid': centroid,
                 'coords': box_coords,
-                'side': self.get_side(centroid)
+                'side': side
             })
+            self.boxes.move_to_end(box_id)
+        self.mark_seen(self.processed_boxes, box_id, timestamp)
+        self.update_zone_members(box_id, box_coords, in_zones)
+
+    @staticmethod
+    def mark_seen(seen, key, timestamp):
+        seen[key] = timestamp
+        seen.move_to_end(key)
+
+    def update_zone_members(self, box_id, box_coords, in_zones=None):
+        if in_zones is None:
+            in_zones = [is_box_in_zone(box_coords, zone_coords) for zone_coords in self.zone_rects]
+        for zone_idx, inside in enumerate(in_zones):
+            members = self.zone_members[zone_idx]
+            if inside:
+                if box_id not in members:
+                    members.add(box_id)
+                    queue = self.zone_queue[zone_idx]
+                    heapq.heappush(queue, (self.boxes[box_id]['order'], box_id))
+                    # Drop entries of boxes that have left once they outnumber the members
+                    if len(queue) > 2 * len(members) + 16:
+                        queue[:] = sorted((self.boxes[b]['order'], b) for b in members)
+            else:
+                members.discard(box_id)
+
+    def first_box_in_zone(self, zone_idx):
+        members = self.zone_members[zone_idx]
+        queue = self.zone_queue[zone_idx]
+        while queue:
+            order, box_id = queue[0]
+            # An ID evicted and tracked again comes back with a new order
+            if box_id in members and self.boxes[box_id]['order'] == order:
+                return box_id
+            heapq.heappop(queue)
+        return None
+
+    def last_box_entered(self, zone_idx):
+        history = self.zone_history[zone_idx]
+        while history:
+            _, box_id = history[0]
+            box = self.boxes.get(box_id)
+            if box is not None and box['zone_id'] == zone_idx:
+                return box_id
+            heapq.heappop(history)
+        return None
 
     def update_box_zone(self, box_id, zone_idx, entry_time):
+        # A box already recorded in this zone still has its (valid) heap entry
+        if self.boxes[box_id]['zone_id'] != zone_idx:
+            heapq.heappush(self.zone_history[zone_idx], (-self.boxes[box_id]['order'], box_id))
         self.boxes[box_id]['zone_id'] = zone_idx
         self.boxes[box_id]['zone_entry_time'] = entry_time
-        mask = self.boxes_df['box_id'] == box_id
-        self.boxes_df.loc[mask, ['zone_id', 'zone_entry_time']] = [zone_idx, entry_time]
+        self.event_count += 1
+        self.box_events.update(box_id, {'zone_id': zone_idx, 'zone_entry_time': entry_time})
+
+    def record_zone_entries(self, box_id, in_zones, timestamp):
+        for zone_idx, zone in enumerate(self.worker_zones):
+            if in_zones[zone_idx]:
+                if self.zone_boxes[zone] != box_id:
+                    self.update_box_zone(box_id, zone_idx, timestamp)
+                self.zone_boxes[zone] = box_id
+
+    def update_frame(self, cls_ids, obj_ids, xyxy, timestamp):
+        # Batched tracking step for one frame: geometry for every detection is computed up front.
+        # Returns how many zone entries / component assignments the frame produced.
+        events_before = self.event_count
+        centroids = box_centroids(xyxy)
+        in_zones = boxes_in_zones(xyxy, self.zone_rects)
+        sides = line_sides(centroids, self.middle_line)
+        for cls, obj_id, coords, centroid, box_zones, side in zip(
+                cls_ids.tolist(), obj_ids.tolist(), xyxy.tolist(), centroids.tolist(), in_zones.tolist(), sides.tolist()):
+            if cls == 0:
+                self.update_boxes(obj_id, tuple(coords), tuple(centroid), timestamp, side=side, in_zones=box_zones)
+                self.record_zone_entries(obj_id, box_zones, timestamp)
+            elif cls == 1:
+                self.assign_component(obj_id, timestamp, tuple(centroid))
+        return self.event_count - events_before
 
     def get_side(self, point):
         (x1, y1), (x2, y2) = self.middle_line
@@ -78,53 +247,122 @@ class ComponentTracker:
 
     def assign_component(self, c_id, entry_time, centroid):
         if c_id in self.processed_components:
+            self.mark_seen(self.processed_components, c_id, entry_time)
             return
 
         assigned_box = None
         method = None
 
-        for zone_idx, zone in enumerate(self.worker_zones):
-            (x1, y1), (x2, y2) = zone
-            zone_coords = (x1, y1, x2, y2)
-            for box_id, box in self.boxes.items():
-                if is_box_in_zone(box['coords'], zone_coords):
-                    if x1 <= centroid[0] <= x2 and y1 <= centroid[1] <= y2:
-                        assigned_box = box_id
-                        method = 'zone'
-                        break
-            if method == 'zone':
-                break
+        for zone_idx, (x1, y1, x2, y2) in enumerate(self.zone_rects):
+            if x1 <= centroid[0] <= x2 and y1 <= centroid[1] <= y2:
+                assigned_box = self.first_box_in_zone(zone_idx)
+                if assigned_box is not None:
+                    method = 'zone'
+                    break
 
         if assigned_box is None:
             component_side = self.get_side(centroid)
-            for zone_idx, zone in enumerate(self.worker_zones):
-                zone_centroid = ((zone[0][0] + zone[1][0]) // 2, (zone[0][1] + zone[1][1]) // 2)
-                if self.get_side(zone_centroid) == component_side:
-                    zone_coords = (zone[0][0], zone[0][1], zone[1][0], zone[1][1])
-                    for box_id, box in self.boxes.items():
-                        if is_box_in_zone(box['coords'], zone_coords):
-                            assigned_box = box_id
-                            break
+            for zone_idx, zone_side in enumerate(self.zone_sides):
+                if zone_side == component_side:
+                    assigned_box = self.first_box_in_zone(zone_idx)
                     if not assigned_box:
-                        for box_id, box in self.boxes.items():
-                            if box['zone_id'] == zone_idx:
-                                assigned_box = box_id
+                        assigned_box = self.last_box_entered(zone_idx)
                     method = 'middle_line'
                     break
 
-        self.components_df = pd.concat([self.components_df, pd.DataFrame([{
+        self.component_events.append({
             'component_id': c_id,
             'box_id': assigned_box,
             'first_detected': entry_time,
             'assignment_method': method
-        }])], ignore_index=True)
-        self.processed_components.add(c_id)
+        })
+        self.mark_seen(self.processed_components, c_id, entry_time)
+        self.event_count += 1
+        self.metrics.inc('tracker_components_total', method=method if assigned_box is not None else 'unassigned')
+        if self.barcodes:
+            self.barcode_pending.add(c_id)
+
+    def set_barcode(self, c_id, barcode):
+        # None settles the row without a barcode
+        self.component_events.update(c_id, {'barcode': barcode})
+        self.barcode_pending.discard(c_id)
+
+    def expire(self, now):
+        if self.track_ttl is not None or self.max_tracks is not None:
+            while self.boxes:
+                box_id, box = next(iter(self.boxes.items()))
+                too_old = self.track_ttl is not None and now - box['last_seen'] > self.track_ttl
+                too_many = self.max_tracks is not None and len(self.boxes) > self.max_tracks
+                if not (too_old or too_many):
+                    break
+                self.evict_box(box_id)
+
+            # Drop heap entries left behind by evicted boxes once they outnumber the live ones
+            for zone_idx, history in enumerate(self.zone_history):
+                if len(history) > 2 * len(self.boxes) + 16:
+                    self.zone_history[zone_idx] = list({(order, box_id) for order, box_id in history
+                                                        if box_id in self.boxes and self.boxes[box_id]['zone_id'] == zone_idx})
+                    heapq.heapify(self.zone_history[zone_idx])
+
+        if self.dedup_window is not None:
+            for seen in (self.processed_boxes, self.processed_components):
+                while seen:
+                    key, last_seen = next(iter(seen.items()))
+                    if now - last_seen <= self.dedup_window:
+                        break
+                    seen.popitem(last=False)
+
+        if self.sink is not None:
+            if self.last_flush is None:
+                self.last_flush = now
+            buffered = len(self.box_events) + len(self.component_events)
+            due = self.flush_interval is not None and buffered and now - self.last_flush >= self.flush_interval
+            if buffered - self.held_rows >= self.flush_rows or due:
+                self.flush(now)
+                self.last_flush = now
+
+    def evict_box(self, box_id):
+        self.boxes.pop(box_id)
+        for members in self.zone_members:
+            members.discard(box_id)
+        for zone, current in self.zone_boxes.items():
+            if current == box_id:
+                self.zone_boxes[zone] = None
+
+    @staticmethod
+    def finished_rows(events, open_keys, cutoff):
+        # Rows that can no longer change (not a live box / a component waiting for its barcode) and are
+        # either ahead of every open row or first detected before cutoff
+        done = np.ones(len(events), dtype=bool)
+        for key in open_keys:
+            slot = events.slot_of(key)
+            if slot is not None:
+                done[slot] = False
+        first_open = len(events) if done.all() else int(np.argmin(done))
+        leading = np.arange(len(events)) < first_open
+        return done & (leading | (events.column('first_detected') <= cutoff))
+
+    def flush(self, now=None, final=False):
+        if final:
+            boxes = np.ones(len(self.box_events), dtype=bool)
+            components = np.ones(len(self.component_events), dtype=bool)
+        else:
+            cutoff = now - self.max_hold
+            boxes = self.finished_rows(self.box_events, self.boxes, cutoff)
+            components = self.finished_rows(self.component_events, self.barcode_pending, cutoff)
+        self.sink.write('boxes', self.box_events.take(boxes))
+        self.sink.write('components', self.component_events.take(components))
+        self.held_rows = len(self.box_events) + len(self.component_events)
 
     def save_to_csv(self):
-        self.boxes_df.drop_duplicates(subset='box_id', keep='first', inplace=True)
-        self.components_df.drop_duplicates(subset='component_id', keep='first', inplace=True)
-        self.boxes_df.to_csv('boxes.csv', index=False)
-        self.components_df.to_csv('main_components.csv', index=False)
+        if self.sink is not None:
+            self.flush(final=True)
+            self.sink.close()
+            return
+        boxes_df = self.boxes_df.drop_duplicates(subset='box_id', keep='first')
+        components_df = self.components_df.drop_duplicates(subset='component_id', keep='first')
+        boxes_df.to_csv('boxes.csv', index=False)
+        components_df.to_csv('main_components.csv', index=False)
 
 def draw_zones_and_save_image(video_path, config_path):
     with open(config_path) as f:
@@ -144,74 +382,226 @@ def draw_zones_and_save_image(video_path, config_path):
         cv2.line(frame, (x1, y1), (x2, y2), (0, 0, 255), 2)
         cv2.imwrite("first_frame_with_zones.jpg", frame)
 
-def main():
-    config_path = "second-zone-setup.json"
-    video_path = "videos/second_run_right 1.mp4"
-    draw_zones_and_save_image(video_path, config_path)
-
-    tracker = ComponentTracker(config_path)
-    model = YOLO("run/train5/weights/best.pt")
+def annotate_frame(frame, cls_ids, obj_ids, xyxy, worker_zones, middle_line):
+    for cls, obj_id, (x1, y1, x2, y2) in zip(cls_ids.tolist(), obj_ids.tolist(), xyxy.tolist()):
+        label = f"{'Box' if cls==0 else 'Component'} {obj_id}"
+        color = (255, 0, 0) if cls == 0 else (0, 255, 255)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+    # Draw zones and middle line for context
+    for (x1, y1), (x2, y2) in worker_zones:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 1)
+    (x1, y1), (x2, y2) = middle_line
+    cv2.line(frame, (x1, y1), (x2, y2), (0, 0, 255), 1)
+
+def timed_frames(source, origin=None, metrics=NULL_METRICS):
+    # Frame time = origin + the frame's position in the video, so a recording replayed at any speed gets the
+    # same timestamps. The origin defaults to the start of the run.
+    # A jump of more than one frame interval in the timestamps means frames are missing from the source (dropped
+    # by the camera / encoder before the video reached us); the pipeline itself never drops frames, it falls behind.
+    origin = datetime.now() if origin is None else origin
+    interval = 1000 / source.fps if source.fps > 0 else None
+    position = 0.0
+    for frame_idx, frame in source:
+        previous = position
+        # Never step back, even if the container's timestamps jitter
+        position = max(position, source.position_ms(frame_idx))
+        if interval is not None and position - previous > 1.5 * interval:
+            metrics.inc('tracker_source_frames_missing_total', round((position - previous) / interval) - 1)
+        yield frame_idx, origin + timedelta(milliseconds=position), frame
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Track boxes and components and link them by worker zone.")
+    parser.add_argument("--config", default="second-zone-setup.json", help="zone config JSON")
+    parser.add_argument("--video", default="videos/second_run_right 1.mp4", help="input video")
+    parser.add_argument("--output", default="output_with_annotations.mp4", help="annotated video output")
+    parser.add_argument("--render", choices=RENDER_MODES, default="full",
+                        help="full: annotate every frame; sampled: every Nth frame; "
+                             "events: clips around assignments; none: headless, CSV output only")
+    parser.add_argument("--sample-every", type=int, default=25, help="frame interval for --render sampled")
+    parser.add_argument("--clip-seconds", type=float, default=2.0, help="pre/post roll for --render events")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--db", action="store_true", help="write rows to SQL Server (settings from db_pool) instead of CSV")
+    output.add_argument("--binary", action="store_true",
+                        help="write boxes.trk / main_components.trk binary event logs instead of CSV "
+                             "(convert with event_log.py)")
+    parser.add_argument("--batch-size", type=int, default=1, help="batch neighbouring frames through the detector")
+    parser.add_argument("--max-wait-ms", type=float, default=20, help="longest wait for a batch to fill")
+    parser.add_argument("--cadence", type=int, default=1,
+                        help="while the scene is static, run the detector only every Nth frame (1 = every frame)")
+    parser.add_argument("--roi-margin", type=int, default=None, metavar="PX",
+                        help="run the detector only on the worker zones + middle line, grown by PX pixels")
+    parser.add_argument("--origin", type=datetime.fromisoformat, default=None,
+                        help="wall-clock time of the video's first frame, e.g. 2025-05-28T15:29:37.583 "
+                             "(default: when the run starts); fix it to get identical timestamps on every replay")
+    parser.add_argument("--barcodes", action="store_true",
+                        help="decode each new component's barcode in the background and add it to main_components.csv")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics at http://0.0.0.0:PORT/metrics while running")
+    parser.add_argument("--metrics-file", default=None, help="write a JSON metrics snapshot to this file periodically")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="seconds between JSON snapshots")
+    args = parser.parse_args()
+    if args.barcodes and (args.db or args.binary):
+        parser.error("--barcodes writes a barcode column, which only the CSV output has")
+    return args
+
+def run_tracking(video_path, config_path, output_path="output_with_annotations.mp4", render="full",
+                 sample_every=25, clip_seconds=2.0, weights=None,
+                 boxes_path="boxes.csv", components_path="main_components.csv", scheduler=None, stream_id=None,
+                 output_sink=None, spool_path=None, idle_every=1, roi_margin=None,
+                 origin=None, barcodes=False, max_frames=None, metrics=NULL_METRICS):
+    # With a BatchScheduler the frames are batched (with other streams, or neighbouring frames of this one)
+    # instead of going through a private model one at a time.
+    # Finished rows leave the tracker about once a second and are written behind the loop, spooling
+    # to spool_path while the output (CSV by default, or output_sink) is unavailable.
+    # idle_every > 1 runs the detector only every idle_every-th frame while the scene is static.
+    # With roi_margin the detector sees only the crop around the zones and middle line (plus that margin).
+    # Events are stamped with video time from origin on (see timed_frames), not with the processing time.
+    # With barcodes, new components are cropped and decoded by a BarcodeStage next to the tracking stage.
+    # metrics (a MetricsRegistry) collects stage timings, queue depths, track counts and the real-time lag.
+    stream_id = video_path if stream_id is None else stream_id
+    # Every series of this run carries its source, so streams sharing a registry stay apart
+    metrics = metrics.with_labels(source=stream_id)
+    target = output_sink if output_sink is not None else CsvSink(boxes_path, components_path)
+    spool_path = spool_path or os.path.splitext(boxes_path)[0] + "_spool.jsonl"
+    tracker = ComponentTracker(config_path, track_ttl=60, dedup_window=600, flush_rows=200, flush_interval=1,
+                               sink=WriteBehindSink(target, spool_path), barcodes=barcodes, metrics=metrics)
+    reader = BarcodeStage() if barcodes else None
+    # The detector backend (PyTorch / ONNX Runtime / OpenVINO) comes from detector_config.json unless weights is given
+    model = load_detector(weights=weights) if scheduler is None else None
+
+    source = FrameSource(video_path, stop_frame=max_frames)
+    sync = FrameSync()
+    roi = None
+    predict_kwargs = {}
+    if roi_margin is not None:
+        roi = RegionOfInterest.from_zones(tracker.worker_zones, tracker.middle_line, roi_margin, source.width, source.height)
+        predict_kwargs['imgsz'] = roi.imgsz()
+        print(f"🔲 Detector ROI ({roi.x1}, {roi.y1})-({roi.x2}, {roi.y2}), {roi.area_share:.0%} of the frame")
+    cadence = AdaptiveCadence(idle_every)
+    last_detections = [frame_detections(None)]
+    # (wall clock, video time) of the first frame tracked, for the real-time lag
+    clock_start = []
+    recorder = FrameRecorder(source, output_path,
+                             lambda frame, *detections: annotate_frame(frame, *detections, tracker.worker_zones, tracker.middle_line),
+                             mode=render, sample_every=sample_every, clip_seconds=clip_seconds)
+
+    # Each stage runs on its own thread: decode -> inference -> tracking logic -> annotate/encode.
+    # With a scheduler, inference is split into submitting the frame and waiting for its batch.
+    # The video is decoded once and the same frame goes to the model and the writer.
+    def infer(item):
+        frame_idx, frame_time, frame = item
+        # Motion outside the ROI doesn't wake the detector either
+        view = roi.crop(frame) if roi is not None else frame
+        if not cadence.should_detect(view):
+            return frame_idx, frame_time, frame, None
+        if scheduler is not None:
+            return frame_idx, frame_time, frame, scheduler.submit(stream_id, frame_idx, view, **predict_kwargs)
+        result = model.track(view, persist=True, tracker="botsort.yaml", verbose=False, **predict_kwargs)[0]
+        return frame_idx, frame_time, frame, result
+
+    def wait(item):
+        # Waiting for the scheduler's batch is inference time, so it gets its own stage instead of
+        # being charged to tracking
+        frame_idx, frame_time, frame, future = item
+        return frame_idx, frame_time, frame, future.result() if future is not None else None
+
+    def track(item):
+        frame_idx, frame_time, frame, result = item
+        metrics.inc('tracker_frames_total', detector='run' if result is not None else 'skipped')
+        if metrics.enabled:
+            if not clock_start:
+                clock_start[:] = [time.monotonic(), frame_time]
+            behind = (time.monotonic() - clock_start[0]) - (frame_time - clock_start[1]).total_seconds()
+            metrics.set('tracker_realtime_lag_seconds', round(behind, 3))
+        if result is None:
+            # Skipped by the cadence: nothing moved, so the last detections still describe the scene
+            sync.skip(frame_idx)
+            tracker.expire(frame_time)
+            if recorder.enabled:
+                return frame_idx, frame, last_detections[0], 0
+            return None
+        sync.check(frame_idx, roi.crop(frame) if roi is not None else frame, result)
+        tracker.expire(frame_time)
+        detections = frame_detections(result)
+        if roi is not None:
+            cls_ids, obj_ids, xyxy = detections
+            detections = cls_ids, obj_ids, roi.to_frame(xyxy)
+        events = tracker.update_frame(*detections, frame_time)
+        cadence.set_active(any(tracker.zone_members))
+        last_detections[0] = detections
+        if reader is not None:
+            reader.update(tracker, frame_idx, frame, *detections)
+        if recorder.enabled:
+            return frame_idx, frame, detections, events
+
+    def encode(item):
+        recorder.record(*item)
+
+    if scheduler is not None:
+        stages = [('submit', infer), ('inference', wait), ('tracking', track)]
+    else:
+        stages = [('inference', infer), ('tracking', track)]
+    if recorder.enabled:
+        stages.append(('encode', encode))
+    pipeline = Pipeline(timed_frames(source, origin, metrics), stages, metrics=metrics)
+    try:
+        pipeline.run()
+    finally:
+        source.release()
+        recorder.close()
+        if reader is not None:
+            reader.close(tracker)
+        tracker.save_to_csv()
+    if cadence.enabled:
+        print(f"🎞️ Detector cadence: {cadence.stats()}")
+    if reader is not None:
+        print(f"🏷️ Barcodes: {reader.stats()}")
+    return pipeline
+
+def track_video(args, output_sink, metrics):
+    if args.batch_size > 1:
+        with BatchScheduler(load_detector(), args.batch_size, args.max_wait_ms / 1000) as scheduler:
+            pipeline = run_tracking(args.video, args.config, args.output, render=args.render, sample_every=args.sample_every,
+                                    clip_seconds=args.clip_seconds, scheduler=scheduler, output_sink=output_sink,
+                                    idle_every=args.cadence, roi_margin=args.roi_margin, origin=args.origin,
+                                    barcodes=args.barcodes, metrics=metrics)
+        print(f"inference batches: {scheduler.stats()}")
+    else:
+        pipeline = run_tracking(args.video, args.config, args.output, render=args.render,
+                                sample_every=args.sample_every, clip_seconds=args.clip_seconds, output_sink=output_sink,
+                                idle_every=args.cadence, roi_margin=args.roi_margin, origin=args.origin,
+                                barcodes=args.barcodes, metrics=metrics)
+    return pipeline
 
-    # Setup video reader
-    cap = cv2.VideoCapture(video_path)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    cap.release()
-
-    # Setup video writer
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    out = cv2.VideoWriter('output_with_annotations.mp4', fourcc, fps, (width, height))
-
-    # Frame index to sync reading with tracking
-    frame_idx = 0
-    cap = cv2.VideoCapture(video_path)
-
-    for result in model.track(source=video_path, stream=True, tracker="botsort.yaml"):
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        frame_time = datetime.now()
-        if result.boxes.id is None:
-            out.write(frame)
-            continue
-
-        for box in result.boxes:
-            cls = int(box.cls[0].item())
-            obj_id = int(box.id[0].item())
-            xyxy = box.xyxy[0].cpu().numpy().astype(int)
-            centroid = ((xyxy[0] + xyxy[2]) // 2, (xyxy[1] + xyxy[3]) // 2)
-            box_coords = (xyxy[0], xyxy[1], xyxy[2], xyxy[3])
-
-            label = f"{'Box' if cls==0 else 'Component'} {obj_id}"
-            color = (255, 0, 0) if cls == 0 else (0, 255, 255)
-            cv2.rectangle(frame, (xyxy[0], xyxy[1]), (xyxy[2], xyxy[3]), color, 2)
-            cv2.putText(frame, label, (xyxy[0], xyxy[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-
-            if cls == 0:
-                tracker.update_boxes(obj_id, box_coords, centroid, frame_time)
-                for zone_idx, zone in enumerate(tracker.worker_zones):
-                    zone_coords = (zone[0][0], zone[0][1], zone[1][0], zone[1][1])
-                    if is_box_in_zone(box_coords, zone_coords):
-                        if tracker.zone_boxes[zone] != obj_id:
-                            tracker.update_box_zone(obj_id, zone_idx, frame_time)
-                        tracker.zone_boxes[zone] = obj_id
-            elif cls == 1:
-                tracker.assign_component(obj_id, frame_time, centroid)
-
-        # Draw zones and middle line for context
-        for (x1, y1), (x2, y2) in tracker.worker_zones:
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 1)
-        (x1, y1), (x2, y2) = tracker.middle_line
-        cv2.line(frame, (x1, y1), (x2, y2), (0, 0, 255), 1)
-
-        out.write(frame)
-        frame_idx += 1
-
-    cap.release()
-    out.release()
-    tracker.save_to_csv()
+def main():
+    args = parse_args()
+    if args.render != "none":
+        draw_zones_and_save_image(args.video, args.config)
+
+    output_sink = None
+    if args.db:
+        output_sink = DbSink()
+    elif args.binary:
+        output_sink = EventLogSink()
+
+    # Metrics stay a no-op unless an exporter asks for them
+    metrics = NULL_METRICS
+    exporters = []
+    if args.metrics_port is not None or args.metrics_file:
+        metrics = MetricsRegistry()
+    if args.metrics_port is not None:
+        exporters.append(PrometheusExporter(metrics, args.metrics_port))
+    if args.metrics_file:
+        exporters.append(JsonFileExporter(metrics, args.metrics_file, args.metrics_interval))
+
+    try:
+        pipeline = track_video(args, output_sink, metrics)
+    finally:
+        for exporter in exporters:
+            exporter.close()
+    pipeline.report()
 
 if __name__ == "__main__":
     main()
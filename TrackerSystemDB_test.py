@@ -1,22 +1,13 @@
-import cv2
 import pandas as pd
 from ultralytics import YOLO
 import json
 from datetime import datetime
 import pyodbc                                       # ← NEW
+from frame_source import FrameSource, track_frames
+from db_writer import BulkWriter, SqlServerBackend, TRACKER_TABLES
+from db_pool import get_pool                        # connection settings live in db_pool.DB_CONFIG / db_config.json
 print(pyodbc.drivers())
 
-# ────────────────────────────────────────────────
-# SQL‑SERVER CONNECTION SETTINGS ─ edit if needed
-# ────────────────────────────────────────────────
-DB_CONFIG = {
-    "driver": "ODBC Driver 17 for SQL Server",      # or 17, 11… (check ODBC Data Sources)
-    "server": "CUIDADO\SQLEXPRESS",                          # "." or "localhost\\SQLEXPRESS" also work
-    "database": "Logical DB",
-    "trusted_connection": "yes",                   
-}
-# ────────────────────────────────────────────────
-
 
 def box_area(box):
     x1, y1, x2, y2 = box
@@ -59,15 +50,6 @@ class ComponentTracker:
         )
         self.processed_components, self.processed_boxes = set(), set()
 
-        # Connect to the SQL Server database
-        self.conn = pyodbc.connect(
-            "DRIVER={ODBC Driver 17 for SQL Server};"
-            "SERVER=CUIDADO\SQLEXPRESS;"
-            "DATABASE=Logical DB;"
-            "Trusted_Connection=yes;"
-        )
-        self.cursor = self.conn.cursor()
-
     def load_config(self, config_path):
         with open(config_path) as f:
             config = json.load(f)
@@ -75,83 +57,19 @@ class ComponentTracker:
         self.middle_line = [tuple(point) for point in config["middle_line"]]
 
     def save_to_db(self):
-        try:
-            # Build connection string from DB_CONFIG dictionary
-            conn_str = (
-                f"DRIVER={DB_CONFIG['driver']};"
-                f"SERVER={DB_CONFIG['server']};"
-                f"DATABASE={DB_CONFIG['database']};"
-            )
-
-            print("Connecting using connection string:")
-            print(conn_str)
-
-            conn = pyodbc.connect(conn_str, autocommit=False)
-            cur = conn.cursor()
-
-            # Ensure one row per primary key
-            self.boxes_df.drop_duplicates(subset="box_id", keep="first", inplace=True)
-            self.components_df.drop_duplicates(subset="component_id", keep="first", inplace=True)
-
-            # Insert / upsert Boxes
-            for _, r in self.boxes_df.iterrows():
-                cur.execute(
-                    """
-                    MERGE dbo.Boxes AS tgt
-                    USING (SELECT ? AS UniqueID, ? AS BoxID) AS src
-                    ON tgt.UniqueID = src.UniqueID
-                    WHEN MATCHED THEN
-                        UPDATE SET first_detected=?, zone_id=?, TimeAtLocation1=?, Barcodo=?
-                    WHEN NOT MATCHED THEN
-                        INSERT (UniqueID, BoxID, first_detected, zone_id, TimeAtLocation1, Barcodo)
-                        VALUES (src.UniqueID, src.BoxID, ?, ?, ?, ?);
-                    """,
-                    r.box_id,
-                    r.box_id,
-                    r.first_detected,
-                    r.zone_id,
-                    r.zone_entry_time,
-                    None,
-                    r.first_detected,
-                    r.zone_id,
-                    r.zone_entry_time,
-                    None,
-                )
-
-            # Insert / upsert Items
-            for _, r in self.components_df.iterrows():
-                cur.execute(
-                    """
-                    MERGE dbo.Items AS tgt
-                    USING (SELECT ? AS UniqueID) AS src
-                    ON tgt.UniqueID = src.UniqueID
-                    WHEN MATCHED THEN
-                        UPDATE SET BoxID=?, first_detected=?, assignment_method=?
-                    WHEN NOT MATCHED THEN
-                        INSERT (UniqueID, BoxID, first_detected, assignment_method)
-                        VALUES (src.UniqueID, ?, ?, ?);
-                    """,
-                    r.component_id,
-                    r.box_id,
-                    r.first_detected,
-                    r.assignment_method,
-                    r.box_id,
-                    r.first_detected,
-                    r.assignment_method,
-                )
-
-            conn.commit()
+        # Stage all rows and upsert each table with one set-based MERGE (first row per key wins)
+        writer = BulkWriter()
+        for name, frame in (("boxes", self.boxes_df), ("components", self.components_df)):
+            table, columns, key, mapping = TRACKER_TABLES[name]
+            writer.register(table, columns, key)
+            writer.add_frame(table, frame, mapping)
 
+        try:
+            # Pooled connection; a failed write is retried on a fresh connection with backoff
+            get_pool().run(lambda conn: writer.flush(SqlServerBackend(conn)))
         except pyodbc.Error as e:
             print("Database connection error:", e)
 
-        finally:
-            try:
-                cur.close()
-                conn.close()
-            except:
-                pass
-
 
 
 def draw_zones_and_save_image(video_path, config_path):
@@ -167,19 +85,10 @@ def main():
     tracker = ComponentTracker(config_path)
     model = YOLO("run/train5/weights/best.pt")
 
-    cap = cv2.VideoCapture(video_path)
-    width, height = int(cap.get(3)), int(cap.get(4))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    cap.release()
-
-    out = cv2.VideoWriter("output_with_annotations_DB.mp4", cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
-    cap = cv2.VideoCapture(video_path)
-
-    for result in model.track(source=video_path, stream=True, tracker="botsort.yaml"):
-        ret, frame = cap.read()
-        if not ret:
-            break
+    source = FrameSource(video_path)
+    out = source.open_writer("output_with_annotations_DB.mp4")
 
+    for frame_idx, frame, result in track_frames(model, source, tracker="botsort.yaml"):
         frame_time = datetime.now()
         if result.boxes.id is None:
             out.write(frame)
@@ -190,7 +99,7 @@ def main():
 
         out.write(frame)
 
-    cap.release()
+    source.release()
     out.release()
     tracker.save_to_db()            # ← NOW WRITES TO SQL SERVER
 
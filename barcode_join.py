@@ -0,0 +1,373 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Output record layout; one row per box/component and one per barcode read that matched nothing
+JOIN_COLUMNS = ["kind", "id", "box_id", "event_time", "barcode_id", "barcode", "read_time", "delta_s", "status"]
+STATUSES = ["OK", "No box barcode", "No component barcode", "Not scanned", "Unmatched barcode"]
+JOIN_DTYPES = {
+    "kind": "string", "id": "Int64", "box_id": "Int64", "event_time": "datetime64[us]", "barcode_id": "Int64",
+    "barcode": "string", "read_time": "datetime64[us]", "delta_s": "float64",
+    "status": pd.CategoricalDtype(STATUSES),
+}
+# Barcodes are read as text so leading zeros survive
+TEXT_COLUMNS = ("barcode",)
+_INF = pd.Timestamp.max
+
+
+def _pyarrow():
+    # Optional: pyarrow makes CSV reads/writes several times faster and is needed for Parquet
+    try:
+        import pyarrow
+        import pyarrow.csv
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        return None
+
+
+def _as_datetime(values):
+    # to_datetime walks the values one by one even when they are already datetime64
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype("datetime64[ns]")
+    return pd.to_datetime(values, errors="coerce", format="ISO8601").astype("datetime64[ns]")
+
+
+class MissingColumnError(ValueError):
+    pass
+
+
+def _require(frame, column, source):
+    if column not in frame.columns:
+        raise MissingColumnError(f"The {source} input has no {column!r} column (it has: {', '.join(map(str, frame.columns))})")
+
+
+def _parse_times(chunk, time_columns):
+    for col in time_columns:
+        if col in chunk.columns:
+            chunk[col] = _as_datetime(chunk[col])
+    return chunk
+
+
+def read_chunks(path, time_columns, chunksize=50_000):
+    # Reads a .csv or .parquet file in bounded chunks (about chunksize rows each) with the given
+    # columns parsed as timestamps
+    pa = _pyarrow()
+    if path.endswith(".parquet"):
+        if pa is None:
+            raise ImportError("Reading Parquet needs pyarrow (pip install pyarrow)")
+        for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield _parse_times(batch.to_pandas(), time_columns)
+        return
+
+    if pa is None:
+        for chunk in pd.read_csv(path, chunksize=chunksize, dtype={c: str for c in TEXT_COLUMNS}):
+            yield _parse_times(chunk, time_columns)
+        return
+
+    # Column types are fixed up front: pyarrow infers the rest from the first block and keeps them
+    with open(path) as f:
+        header = f.readline().rstrip("\r\n").split(",")
+        row_bytes = max(16, len(f.readline()))
+    column_types = {c: pa.string() for c in TEXT_COLUMNS if c in header}
+    column_types.update({c: pa.timestamp("ns") for c in time_columns if c in header})
+    reader = pa.csv.open_csv(path, read_options=pa.csv.ReadOptions(block_size=max(1 << 16, chunksize * row_bytes)),
+                             convert_options=pa.csv.ConvertOptions(column_types=column_types))
+    for batch in reader:
+        if batch.num_rows:
+            yield _parse_times(batch.to_pandas(), time_columns)
+
+
+class RecordWriter:
+    # Appends joined records to a .csv or .parquet file as they are produced, with the JOIN_DTYPES
+    # column types. Parquet (and the fast CSV path) use pyarrow; plain CSV falls back to pandas.
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self.pa = _pyarrow()
+        if self.parquet and self.pa is None:
+            raise ImportError("Writing Parquet needs pyarrow (pip install pyarrow)")
+        self.writer = None
+        self.sink = None
+        self.rows = 0
+
+    def _schema(self):
+        pa = self.pa
+        return pa.schema([("kind", pa.string()), ("id", pa.int64()), ("box_id", pa.int64()),
+                          ("event_time", pa.timestamp("us")), ("barcode_id", pa.int64()), ("barcode", pa.string()),
+                          ("read_time", pa.timestamp("us")), ("delta_s", pa.float64()), ("status", pa.string())])
+
+    def write(self, frame):
+        frame = frame.reindex(columns=JOIN_COLUMNS).astype(JOIN_DTYPES)
+        if self.pa is None:
+            frame.to_csv(self.path, mode="w" if self.rows == 0 else "a", header=self.rows == 0, index=False)
+        else:
+            frame = frame.astype({"status": "string"})
+            table = self.pa.Table.from_pandas(frame, schema=self._schema(), preserve_index=False)
+            if self.writer is None:
+                if self.parquet:
+                    self.writer = self.pa.parquet.ParquetWriter(self.path, table.schema)
+                else:
+                    with open(self.path, "w", newline="") as f:
+                        f.write(",".join(JOIN_COLUMNS) + "\n")
+                    options = self.pa.csv.WriteOptions(include_header=False, quoting_style="none")
+                    self.sink = self.pa.OSFile(self.path, "ab")
+                    self.writer = self.pa.csv.CSVWriter(self.sink, table.schema, write_options=options)
+            try:
+                self.writer.write_table(table)
+            except self.pa.ArrowInvalid:
+                # unquoted CSV cannot hold a value with a comma/quote in it; let pandas quote this chunk
+                with open(self.path, "a", newline="") as f:
+                    frame.to_csv(f, header=False, index=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self.writer is None and self.rows == 0:
+            # still leave a valid (empty) output behind
+            self.write(pd.DataFrame(columns=JOIN_COLUMNS))
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def follow_csv(path, time_columns, poll_interval=0.5, idle_timeout=None):
+    # Tails a CSV that another process keeps appending to (the live barcode reader log, or the tracker's
+    # boxes.csv / main_components.csv) and yields the new complete rows as DataFrames. Stops after
+    # idle_timeout seconds without new rows.
+    while not os.path.exists(path):
+        time.sleep(poll_interval)
+    with open(path, newline="") as f:
+        # The writer may not have finished the header line yet
+        header = f.readline()
+        while not header.endswith("\n"):
+            time.sleep(poll_interval)
+            header += f.readline()
+        header = header.rstrip("\r\n").split(",")
+        pending, idle = "", 0.0
+        while True:
+            data = f.read()
+            if data:
+                idle = 0.0
+                data = pending + data
+                cut = data.rfind("\n") + 1
+                pending, lines = data[cut:], data[:cut].splitlines()
+                rows = [line.split(",") for line in lines if line]
+                if rows:
+                    yield _parse_times(pd.DataFrame(rows, columns=header).replace("", np.nan), time_columns)
+                continue
+            if idle_timeout is not None and idle >= idle_timeout:
+                return
+            time.sleep(poll_interval)
+            idle += poll_interval
+
+
+def classify(frame):
+    # Status for a whole batch of records at once (column masks, no per-row Python)
+    kind = frame["kind"]
+    codes = np.select(
+        [kind.eq("barcode").to_numpy(bool), frame["barcode"].notna().to_numpy(),
+         frame["event_time"].isna().to_numpy(), kind.eq("box").to_numpy(bool)],
+        [4, 0, 3, 1], default=2)
+    return pd.Categorical.from_codes(codes, dtype=JOIN_DTYPES["status"])
+
+
+class BarcodeJoiner:
+    # Matches barcode reads to boxes and components by timestamp instead of by position.
+    # Every box/component gets at most one read (and every read at most one entity): the one nearest
+    # in time within `tolerance`, the closest pair winning when two entities want the same read.
+    # Input only has to be sorted per stream; records are emitted once the watermark (the time up to
+    # which every stream is known to be complete) has moved past them, so only the open window is kept.
+    def __init__(self, tolerance=5.0, direction="nearest", reader_offset=0.0, max_rounds=4):
+        self.tolerance = pd.Timedelta(seconds=tolerance)
+        self.direction = direction
+        self.reader_offset = pd.Timedelta(seconds=reader_offset)
+        self.max_rounds = max_rounds
+        self.entities = self._empty_entities()
+        self.reads = self._empty_reads()
+        self.read_seq = 0
+        self.matched = 0
+        self.unmatched_entities = 0
+        self.unmatched_reads = 0
+        self.late_entities = 0
+        self.peak_open = 0
+        self.watermark = None
+
+    @staticmethod
+    def _empty_entities():
+        return pd.DataFrame({"kind": pd.Series(dtype=object), "id": pd.Series(dtype="Int64"),
+                             "box_id": pd.Series(dtype="Int64"), "event_time": pd.Series(dtype="datetime64[ns]")})
+
+    @staticmethod
+    def _empty_reads():
+        return pd.DataFrame({"_read": pd.Series(dtype="int64"), "barcode_id": pd.Series(dtype="Int64"),
+                             "barcode": pd.Series(dtype="string"), "read_time": pd.Series(dtype="datetime64[ns]")})
+
+    def add_boxes(self, frame, time_column="zone_entry_time"):
+        # A box is scanned when it enters a worker zone
+        _require(frame, time_column, "boxes")
+        self._add_entities("box", frame["box_id"], frame["box_id"], frame[time_column])
+
+    def add_components(self, frame, time_column="first_detected"):
+        # A component is scanned around when it is first seen (the tracker's main_components.csv has no
+        # later event; pass e.g. line_touch_time when the input has one)
+        _require(frame, time_column, "components")
+        self._add_entities("component", frame["component_id"], frame["box_id"], frame[time_column])
+
+    def _add_entities(self, kind, ids, box_ids, times):
+        chunk = pd.DataFrame({"kind": kind, "id": pd.to_numeric(ids, errors="coerce").astype("Int64"),
+                              "box_id": pd.to_numeric(box_ids, errors="coerce").astype("Int64"),
+                              "event_time": _as_datetime(times)})
+        if self.watermark is not None:
+            # Arrived after their matching window was closed: reads they would have taken may be gone
+            self.late_entities += int((chunk["event_time"] <= self.watermark - 2 * self.tolerance).sum())
+        self.entities = pd.concat([self.entities, chunk], ignore_index=True)
+
+    def add_reads(self, frame, time_column="time_of_detection"):
+        n = len(frame)
+        barcode_ids = frame["barcode_id"] if "barcode_id" in frame.columns else [None] * n
+        chunk = pd.DataFrame({"_read": np.arange(self.read_seq, self.read_seq + n, dtype="int64"),
+                              "barcode_id": pd.to_numeric(pd.Series(barcode_ids, index=frame.index),
+                                                          errors="coerce").astype("Int64"),
+                              "barcode": frame["barcode"].astype("string"),
+                              "read_time": _as_datetime(frame[time_column]) + self.reader_offset})
+        self.read_seq += n
+        self.reads = pd.concat([self.reads, chunk.dropna(subset=["read_time"])], ignore_index=True)
+
+    def pending(self):
+        return len(self.entities), len(self.reads)
+
+    def emit(self, watermark):
+        # An entity is final once every read it could take (up to +tolerance) and every entity that could
+        # compete for such a read (another +tolerance) has arrived, i.e. at watermark - 2 * tolerance.
+        # A read nobody took is final once the last entity that could still claim it is, at - 3 * tolerance.
+        watermark = pd.Timestamp(watermark)
+        self.watermark = watermark if self.watermark is None else max(self.watermark, watermark)
+        self.peak_open = max(self.peak_open, len(self.entities) + len(self.reads))
+        times = self.entities["event_time"]
+        ready_mask = times.isna() | (times <= watermark - 2 * self.tolerance)
+        if not ready_mask.any():
+            return self._finish_reads(watermark, [])
+
+        # Entities that are not final yet still compete for reads; only the final ones' results are kept
+        # and reads claimed by the others stay open
+        entities = self.entities.assign(_ready=ready_mask.to_numpy()).sort_values("event_time", kind="stable")
+        self.entities = self.entities[~ready_mask].reset_index(drop=True)
+        self.reads = self.reads.sort_values("read_time", kind="stable").reset_index(drop=True)
+        matched, leftover = self._match(entities, self.reads)
+        matched = matched[matched["_ready"]]
+        leftover = leftover[leftover["_ready"]]
+        self.reads = self.reads[~self.reads["_read"].isin(matched["_read"])]
+
+        out = [matched.drop(columns=["_ready", "_read"])] if len(matched) else []
+        if len(leftover):
+            out.append(leftover.drop(columns=["_ready"]).assign(barcode_id=pd.NA, barcode=None, read_time=pd.NaT))
+            self.unmatched_entities += len(leftover)
+        self.matched += len(matched)
+        return self._finish_reads(watermark, out)
+
+    def _match(self, entities, reads):
+        timed = entities[entities["event_time"].notna()].assign(_row=lambda d: np.arange(len(d)))
+        untimed = entities[entities["event_time"].isna()]
+        hits = []
+        for _ in range(self.max_rounds):
+            if timed.empty or reads.empty:
+                break
+            pairs = pd.merge_asof(timed, reads, left_on="event_time", right_on="read_time",
+                                  direction=self.direction, tolerance=self.tolerance)
+            pairs = pairs[pairs["_read"].notna()]
+            if pairs.empty:
+                break
+            # One read per entity and one entity per read: the closest pair keeps the read, the
+            # others try again against the reads that are still free
+            pairs = (pairs.assign(_gap=(pairs["read_time"] - pairs["event_time"]).abs())
+                     .sort_values(["_gap", "_row"], kind="stable").drop_duplicates("_read"))
+            hits.append(pairs)
+            timed = timed[~timed["_row"].isin(pairs["_row"])]
+            reads = reads[~reads["_read"].isin(pairs["_read"])]
+
+        if hits:
+            matched = pd.concat(hits, ignore_index=True).sort_values("_row").drop(columns=["_row", "_gap"])
+        else:
+            matched = pd.DataFrame(columns=list(entities.columns) + ["_read"]).astype({"_ready": bool})
+        leftover = pd.concat([timed, untimed], ignore_index=True) if len(untimed) else timed
+        return matched, leftover.drop(columns=["_row"])
+
+    def _finish_reads(self, watermark, out):
+        stale = self.reads["read_time"] <= watermark - 3 * self.tolerance
+        if stale.any():
+            orphans = self.reads[stale].drop(columns=["_read"]).assign(kind="barcode", id=pd.NA, box_id=pd.NA,
+                                                                      event_time=pd.NaT)
+            self.reads = self.reads[~stale].reset_index(drop=True)
+            self.unmatched_reads += len(orphans)
+            out.append(orphans)
+        out = [f for f in out if len(f)]
+        if not out:
+            return pd.DataFrame(columns=JOIN_COLUMNS)
+        return self._with_status(pd.concat(out, ignore_index=True))
+
+    def _with_status(self, frame):
+        frame = frame.reindex(columns=JOIN_COLUMNS)
+        frame["delta_s"] = (frame["read_time"] - frame["event_time"]).dt.total_seconds().round(3)
+        frame["status"] = classify(frame)
+        return frame
+
+    def flush(self):
+        # End of input: everything still open is final
+        return self.emit(_INF)
+
+    def stats(self):
+        return {"matched": self.matched, "unmatched_entities": self.unmatched_entities,
+                "unmatched_reads": self.unmatched_reads, "late_entities": self.late_entities,
+                "open_entities": len(self.entities),
+                "open_reads": len(self.reads), "peak_open": self.peak_open}
+
+
+def join_streams(joiner, boxes, components, reads, box_time="zone_entry_time", component_time="first_detected",
+                 read_time="time_of_detection", lateness=0.0):
+    # Pulls chunks from the three chunk iterators and yields joined records as soon as the watermark
+    # allows. Boxes and components are expected in first_detected order (their scan time is never
+    # earlier), reads in read order; rows up to `lateness` seconds out of that order are still joined
+    # correctly, as the watermark is held back by that much. The watermark is the oldest latest-timestamp
+    # over the streams still open; the next chunk always comes from that lagging stream, so the open
+    # window stays about one chunk per stream wide however differently dense the streams are.
+    lateness = pd.Timedelta(seconds=lateness)
+    streams = {
+        "boxes": (iter(boxes), lambda c: joiner.add_boxes(c, box_time), "first_detected"),
+        "components": (iter(components), lambda c: joiner.add_components(c, component_time), "first_detected"),
+        "reads": (iter(reads), lambda c: joiner.add_reads(c, read_time), read_time),
+    }
+    latest = {name: None for name in streams}
+    while streams:
+        name = min(streams, key=lambda n: (latest[n] is not None, latest[n] or _INF))
+        chunks, add, order_column = streams[name]
+        chunk = next(chunks, None)
+        if chunk is None:
+            del streams[name]
+            latest[name] = _INF
+        else:
+            _require(chunk, order_column, name)
+            add(chunk)
+            t = _as_datetime(chunk[order_column]).max()
+            if pd.notna(t):
+                # reader timestamps are compared after the configured clock offset
+                t += joiner.reader_offset if name == "reads" else pd.Timedelta(0)
+                latest[name] = t if latest[name] is None else max(latest[name], t)
+        if any(t is None for t in latest.values()):
+            continue
+        out = joiner.emit(min(latest.values()) - lateness)
+        if len(out):
+            yield out
+    out = joiner.flush()
+    if len(out):
+        yield out
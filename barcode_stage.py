@@ -0,0 +1,169 @@
+import heapq
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+_local = threading.local()
+
+
+def _zbar():
+    # pyzbar needs the zbar shared library; without it OpenCV's detector is used
+    try:
+        from pyzbar import pyzbar
+    except ImportError:
+        return None
+    return pyzbar
+
+
+def decode_barcode(crop, zbar=None):
+    # First barcode found in the crop, or None
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    if zbar is not None:
+        found = zbar.decode(gray)
+        return found[0].data.decode("utf-8", "replace") if found else None
+    # BarcodeDetector isn't thread-safe, so each worker thread gets its own
+    detector = getattr(_local, "detector", None)
+    if detector is None:
+        detector = _local.detector = cv2.barcode.BarcodeDetector()
+    text = detector.detectAndDecode(gray)[0]
+    if not text:
+        # The detector's window sizes are fractions of the image, so a barcode filling most of a tight crop
+        # is missed; read the crop as the barcode region instead
+        h, w = gray.shape[:2]
+        corners = np.array([[[0, h - 1], [0, 0], [w - 1, 0], [w - 1, h - 1]]], dtype=np.float32)
+        text = detector.decode(gray, corners)[0]
+    return text or None
+
+
+def crop_score(crop):
+    # Sharp, large crops first: variance of the Laplacian (focus / motion blur) scaled by the crop's side
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    return float(cv2.Laplacian(gray, cv2.CV_32F).var()) * gray.size ** 0.5
+
+
+class BarcodeStage:
+    # Reads each component's barcode once, off the tracking thread. A component is queued when the tracker
+    # first assigns it; every sighting until it is read offers a crop, of which the top_k by crop_score are
+    # cached per track (as copies, the frame goes on to the encoder). One decode per track runs at a time
+    # in a thread pool, always on the best cached crop. After a failed decode the rest of the cache is tried,
+    # and new sightings are only cached when they score higher than every crop tried so far. This goes on
+    # until a read succeeds, max_attempts decodes failed or the track has not been seen for `patience`
+    # frames; then its cache entry is dropped. The result is written into the component's row, which the
+    # tracker holds back until then.
+    def __init__(self, workers=2, max_attempts=10, patience=100, pad=8, top_k=3):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="barcode")
+        self.zbar = _zbar()
+        self.max_attempts = max_attempts
+        self.patience = patience
+        self.pad = pad
+        self.top_k = top_k
+        # track ID -> min-heap of (score, seq, crop), at most top_k long
+        self.candidates = {}
+        self.seq = itertools.count()
+        self.in_flight = {}
+        self.attempts = {}
+        self.best_tried = {}
+        self.last_seen = {}
+        self.frame_idx = 0
+        self.sightings = 0
+        self.decodes = 0
+        self.reads = 0
+        self.given_up = 0
+
+    @property
+    def backend(self):
+        return "pyzbar" if self.zbar is not None else "opencv"
+
+    def _crop(self, frame, xyxy):
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = xyxy
+        return frame[max(0, y1 - self.pad):min(h, y2 + self.pad), max(0, x1 - self.pad):min(w, x2 + self.pad)]
+
+    def _offer(self, obj_id, crop):
+        # Only crops that make the top_k are copied
+        heap = self.candidates.setdefault(obj_id, [])
+        score = crop_score(crop)
+        if score <= self.best_tried.get(obj_id, -1.0):
+            return
+        if len(heap) < self.top_k:
+            heapq.heappush(heap, (score, next(self.seq), crop.copy()))
+        elif score > heap[0][0]:
+            heapq.heapreplace(heap, (score, next(self.seq), crop.copy()))
+
+    def _best(self, obj_id):
+        heap = self.candidates.get(obj_id)
+        if not heap:
+            return None
+        best = max(range(len(heap)), key=lambda i: heap[i][0])
+        score, _, crop = heap[best]
+        heap[best] = heap[-1]
+        heap.pop()
+        heapq.heapify(heap)
+        self.best_tried[obj_id] = max(score, self.best_tried.get(obj_id, -1.0))
+        return crop
+
+    def update(self, tracker, frame_idx, frame, cls_ids, obj_ids, xyxy):
+        self.frame_idx = frame_idx
+        self.collect(tracker)
+        for cls, obj_id, box in zip(cls_ids.tolist(), obj_ids.tolist(), xyxy.tolist()):
+            if cls != 1 or obj_id not in tracker.barcode_pending:
+                continue
+            self.last_seen[obj_id] = frame_idx
+            crop = self._crop(frame, box)
+            if crop.size:
+                self.sightings += 1
+                self._offer(obj_id, crop)
+        for obj_id in self.candidates:
+            if obj_id not in self.in_flight:
+                crop = self._best(obj_id)
+                if crop is not None:
+                    self.in_flight[obj_id] = self.pool.submit(decode_barcode, crop, self.zbar)
+        # Components that left the view (or never gave a crop) are not waited on forever
+        for obj_id in [c for c in tracker.barcode_pending if c not in self.in_flight]:
+            if frame_idx - self.last_seen.setdefault(obj_id, frame_idx) >= self.patience:
+                self._give_up(tracker, obj_id)
+
+    def collect(self, tracker, wait=False):
+        for obj_id, future in list(self.in_flight.items()):
+            if not wait and not future.done():
+                continue
+            del self.in_flight[obj_id]
+            self.decodes += 1
+            try:
+                barcode = future.result()
+            except Exception as e:
+                print(f"⚠️ Barcode decode failed for component {obj_id}: {e}")
+                barcode = None
+            if barcode is not None:
+                self.reads += 1
+                tracker.set_barcode(obj_id, barcode)
+                self._forget(obj_id)
+                continue
+            self.attempts[obj_id] = self.attempts.get(obj_id, 0) + 1
+            if self.attempts[obj_id] >= self.max_attempts:
+                self._give_up(tracker, obj_id)
+
+    def _give_up(self, tracker, obj_id):
+        self.given_up += 1
+        tracker.set_barcode(obj_id, None)
+        self._forget(obj_id)
+
+    def _forget(self, obj_id):
+        self.attempts.pop(obj_id, None)
+        self.best_tried.pop(obj_id, None)
+        self.last_seen.pop(obj_id, None)
+        self.candidates.pop(obj_id, None)
+
+    def close(self, tracker):
+        # Waits for the decodes still running; whatever is still unread is released without a barcode
+        self.collect(tracker, wait=True)
+        for obj_id in list(tracker.barcode_pending):
+            self._give_up(tracker, obj_id)
+        self.pool.shutdown()
+
+    def stats(self):
+        return {'backend': self.backend, 'sightings': self.sightings, 'decodes': self.decodes, 'reads': self.reads,
+                'unread': self.given_up}
@@ -0,0 +1,247 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from pipeline import StageStats
+from sinks import CsvSink
+
+# Fixed clock for every run, so tracker output is comparable between versions
+ORIGIN = datetime(2025, 6, 15, 8, 0)
+
+
+class TimedSink:
+    # Wraps the real output and times every batch the write-behind thread hands it
+    def __init__(self, target):
+        self.target = target
+        self.stats = StageStats('write')
+        self.rows = 0
+
+    def write(self, table, frame):
+        t0 = time.perf_counter()
+        self.target.write(table, frame)
+        self.stats.add(time.perf_counter() - t0)
+        self.rows += len(frame)
+
+    def close(self):
+        self.target.close()
+
+    def as_dict(self):
+        stats = self.stats.as_dict()
+        stats['rows'] = self.rows
+        stats['rows_per_s'] = round(self.rows / self.stats.busy, 1) if self.stats.busy else 0.0
+        return stats
+
+
+def bench_video(video, config, render="full", max_frames=None, weights=None, roi_margin=None, idle_every=1):
+    # Layer 1: the real pipeline on a recorded video, per stage (decode, inference, tracking, encode, write)
+    from TrackerSystem import run_tracking
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sink = TimedSink(CsvSink(os.path.join(tmp, "boxes.csv"), os.path.join(tmp, "main_components.csv")))
+        t0 = time.perf_counter()
+        pipeline = run_tracking(video, config, os.path.join(tmp, "annotated.mp4"), render=render, weights=weights,
+                                boxes_path=os.path.join(tmp, "boxes.csv"), output_sink=sink, origin=ORIGIN,
+                                roi_margin=roi_margin, idle_every=idle_every, max_frames=max_frames)
+        elapsed = time.perf_counter() - t0
+    stages = [s.as_dict() for s in pipeline.stats] + [sink.as_dict()]
+    frames = pipeline.stats[0].items
+    return {"video": video, "config": config, "frames": frames, "wall_s": round(elapsed, 3),
+            "end_to_end_fps": round(frames / elapsed, 2) if elapsed else 0.0, "stages": stages}
+
+
+def synthetic_detections(config_path, frames, boxes_every=50, components_per_box=3, fps=25.0, seed=0):
+    # Model-free detection stream shaped like the belt: boxes travel into a worker zone and stay there while
+    # their components are taken out and carried across the middle line (some first seen halfway). Every
+    # object is a set of linear legs; all detections are built at once with numpy and cut into frames.
+    # Returns (bounds, cls, ids, xyxy, times): frame i owns rows bounds[i]:bounds[i + 1].
+    with open(config_path) as f:
+        config = json.load(f)
+    rng = np.random.default_rng(seed)
+    zones = np.array([(x1, y1, x2, y2) for (x1, y1), (x2, y2) in config["worker_zones"]], dtype=float)
+    (lx1, ly1), (lx2, ly2) = config["middle_line"]
+    line_mid = np.array([(lx1 + lx2) / 2, (ly1 + ly2) / 2])
+
+    n_boxes = max(1, frames // boxes_every)
+    box_start = np.sort(rng.integers(0, frames, n_boxes))
+    zone = rng.integers(0, len(zones), n_boxes)
+    zone_center = np.stack([(zones[zone, 0] + zones[zone, 2]) / 2, (zones[zone, 1] + zones[zone, 3]) / 2], axis=1)
+    travel = rng.integers(20, 60, n_boxes)
+    dwell = rng.integers(100, 300, n_boxes)
+    box_from = zone_center + rng.normal(0, 1, (n_boxes, 2)) * 200
+
+    n_comps = n_boxes * components_per_box
+    owner = np.repeat(np.arange(n_boxes), components_per_box)
+    comp_start = box_start[owner] + travel[owner] + (rng.random(n_comps) * dwell[owner] * 0.8).astype(int)
+    comp_life = rng.integers(30, 90, n_comps)
+    comp_to = 2 * line_mid - zone_center[owner] + rng.normal(0, 20, (n_comps, 2))
+    # Some components are only picked up once they are out of the zone (assigned by the middle line)
+    late = (rng.random(n_comps) < 0.3)[:, None]
+    comp_from = np.where(late, (zone_center[owner] + comp_to) / 2, zone_center[owner])
+
+    # legs: id, class, first frame, frames, start xy, end xy, half size
+    ids = np.concatenate([np.arange(n_boxes), np.arange(n_boxes), n_boxes + np.arange(n_comps)])
+    cls = np.concatenate([np.zeros(2 * n_boxes, dtype=int), np.ones(n_comps, dtype=int)])
+    first = np.concatenate([box_start, box_start + travel, comp_start])
+    length = np.concatenate([travel, dwell, comp_life])
+    start_xy = np.concatenate([box_from, zone_center, comp_from])
+    end_xy = np.concatenate([zone_center, zone_center, comp_to])
+    leg_zone = zones[np.concatenate([zone, zone, zone[owner]])]
+    zone_side = np.minimum(leg_zone[:, 2] - leg_zone[:, 0], leg_zone[:, 3] - leg_zone[:, 1])
+    half = np.where(cls == 0, np.minimum(40.0, zone_side / 3), 12.0)
+
+    leg = np.repeat(np.arange(len(ids)), length)
+    offset = np.arange(len(leg)) - np.repeat(np.cumsum(length) - length, length)
+    frame_idx = first[leg] + offset
+    keep = frame_idx < frames
+    leg, offset, frame_idx = leg[keep], offset[keep], frame_idx[keep]
+    t = (offset / np.maximum(1, length[leg] - 1))[:, None]
+    center = start_xy[leg] + (end_xy[leg] - start_xy[leg]) * t + rng.normal(0, 1.5, (len(leg), 2))
+    xyxy = np.concatenate([center - half[leg, None], center + half[leg, None]], axis=1).astype(np.int64)
+
+    order = np.argsort(frame_idx, kind="stable")
+    bounds = np.searchsorted(frame_idx[order], np.arange(frames + 1))
+    times = [ORIGIN + timedelta(seconds=i / fps) for i in range(frames)]
+    return bounds, cls[leg][order], ids[leg][order], xyxy[order], times
+
+
+def bench_synthetic(config, events=1_000_000, per_frame=8, sink=True, seed=0):
+    # Layer 2: replay a synthetic detection stream into ComponentTracker, no video or model involved
+    from TrackerSystem import ComponentTracker
+    from sinks import WriteBehindSink
+
+    frames = max(1, events // per_frame)
+    t0 = time.perf_counter()
+    bounds, cls, ids, xyxy, times = synthetic_detections(config, frames, seed=seed)
+    generate_s = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = None
+        if sink:
+            output = TimedSink(CsvSink(os.path.join(tmp, "boxes.csv"), os.path.join(tmp, "main_components.csv")))
+        tracker = ComponentTracker(config, track_ttl=60, dedup_window=600, flush_rows=200, flush_interval=1,
+                                   sink=WriteBehindSink(output, os.path.join(tmp, "spool.jsonl")) if sink else None)
+        stats = StageStats('tracking')
+        for i in range(frames):
+            lo, hi = bounds[i], bounds[i + 1]
+            f0 = time.perf_counter()
+            tracker.expire(times[i])
+            tracker.update_frame(cls[lo:hi], ids[lo:hi], xyxy[lo:hi], times[i])
+            stats.add(time.perf_counter() - f0)
+        t0 = time.perf_counter()
+        if sink:
+            tracker.save_to_csv()
+        close_s = time.perf_counter() - t0
+
+    detections = int(bounds[-1])
+    result = {"frames": frames, "detections": detections, "generate_s": round(generate_s, 3),
+              "tracking": stats.as_dict(), "detections_per_s": round(detections / stats.busy, 1) if stats.busy else 0.0,
+              "boxes": int(len(np.unique(ids[cls == 0]))),
+              "components": int(len(np.unique(ids[cls == 1]))), "close_s": round(close_s, 3)}
+    if sink:
+        result["write"] = output.as_dict()
+    return result
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "time": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+            "machine": platform.machine(), "processor": platform.processor(), "cpus": os.cpu_count(),
+            "numpy": np.__version__}
+
+
+def headline(results):
+    # The throughput numbers compared between runs: name -> value, higher is better
+    numbers = {}
+    for run in results.get("videos", []):
+        if "error" in run:
+            continue
+        numbers[f"{run['video']}:end_to_end_fps"] = run["end_to_end_fps"]
+        for stage in run["stages"]:
+            numbers[f"{run['video']}:{stage['stage']}_fps"] = stage["fps"]
+    if "synthetic" in results:
+        numbers["synthetic:detections_per_s"] = results["synthetic"]["detections_per_s"]
+        if "write" in results["synthetic"]:
+            numbers["synthetic:write_rows_per_s"] = results["synthetic"]["write"]["rows_per_s"]
+    return numbers
+
+
+def compare(results, baseline_path, tolerance=0.1):
+    # Prints every headline number that moved by more than tolerance against a previous results file
+    with open(baseline_path) as f:
+        baseline = headline(json.load(f))
+    regressions = 0
+    for name, value in headline(results).items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = value / before - 1
+        if change < -tolerance:
+            regressions += 1
+            print(f"⚠️ {name}: {before:,.1f} -> {value:,.1f} ({change:+.1%})")
+        elif change > tolerance:
+            print(f"✅ {name}: {before:,.1f} -> {value:,.1f} ({change:+.1%})")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="End-to-end benchmarks: per-stage pipeline timings on the recorded "
+                                                 "videos and a synthetic detection stream through ComponentTracker.")
+    parser.add_argument("--cameras", default="cameras.json", help="videos and their zone configs")
+    parser.add_argument("--video", help="benchmark only this video (with --config)")
+    parser.add_argument("--config", default="zone_setup.json", help="zone config for --video and the synthetic stream")
+    parser.add_argument("--render", default="full", help="render mode of the video runs")
+    parser.add_argument("--max-frames", type=int, default=None, help="stop each video after this many frames")
+    parser.add_argument("--weights", default=None, help="model file (default: the backend from detector_config.json)")
+    parser.add_argument("--skip-videos", action="store_true")
+    parser.add_argument("--events", type=int, default=1_000_000, help="synthetic detections (0 skips the layer)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative slowdown reported as a regression")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = {"environment": environment()}
+
+    if not args.skip_videos:
+        if args.video:
+            runs = [(args.video, args.config)]
+        else:
+            with open(args.cameras) as f:
+                runs = [(camera["video"], camera["config"]) for camera in json.load(f)["cameras"]]
+        results["videos"] = []
+        for video, config in runs:
+            try:
+                run = bench_video(video, config, render=args.render, max_frames=args.max_frames, weights=args.weights)
+                print(f"🎞️ {video}: {run['frames']} frames, {run['end_to_end_fps']} fps end to end")
+            except (IOError, OSError) as e:
+                run = {"video": video, "config": config, "error": str(e)}
+                print(f"⚠️ Skipped {video}: {e}")
+            results["videos"].append(run)
+
+    if args.events:
+        results["synthetic"] = bench_synthetic(args.config, args.events)
+        print(f"🧮 Synthetic: {results['synthetic']['detections']:,} detections at "
+              f"{results['synthetic']['detections_per_s']:,.0f}/s")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results saved as '{args.output}'")
+    if args.baseline and compare(results, args.baseline, args.tolerance):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
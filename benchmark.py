@@ -0,0 +1,327 @@
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+import pandas as pd
+
+from ChunkedReplaySystem import plan_segments, stitch
+from barcode_stage import BarcodeStage, decode_barcode
+from barcode_join import BarcodeJoiner, RecordWriter, _pyarrow, classify, join_streams, read_chunks
+from db_writer import BulkWriter, SqliteBackend
+from event_log import EventLogWriter, log_to_csv, open_log, read_log
+from TrackerSystem import ComponentTracker, is_box_in_zone, boxes_in_zones, box_centroids, line_sides
+
+CONFIG_PATH = "zone_setup.json"
+
+
+def bench_zone_updates(sizes=(1_000, 10_000, 100_000), events=20_000, seed=0):
+    # Per-event latency of update_box_zone should stay flat as the shift grows
+    rng = random.Random(seed)
+    start = datetime(2025, 6, 15, 8, 0)
+    print(f"{'boxes':>8} {'events':>8} {'us/event':>10}")
+    for size in sizes:
+        tracker = ComponentTracker(CONFIG_PATH)
+        for box_id in range(size):
+            tracker.update_boxes(box_id, (0, 0, 10, 10), (5, 5), start)
+
+        ids = [rng.randrange(size) for _ in range(events)]
+        t0 = time.perf_counter()
+        for i, box_id in enumerate(ids):
+            tracker.update_box_zone(box_id, i % 2, start + timedelta(milliseconds=i))
+        elapsed = time.perf_counter() - t0
+        print(f"{size:>8} {events:>8} {elapsed / events * 1e6:>10.2f}")
+
+
+def bench_assignment(sizes=(1_000, 10_000, 100_000), crowds=(1, 100, 1_000), events=20_000, seed=0):
+    # assign_component cost should not depend on how many boxes have been tracked, nor grow much with
+    # busy zones: zone 0 holds `crowd` boxes at once, zone 1 none (components there fall back to the last
+    # box that entered it, with `crowd` boxes that have left it), and both keep `crowd` stale entries of
+    # evicted boxes
+    rng = random.Random(seed)
+    start = datetime(2025, 6, 15, 8, 0)
+    print(f"{'boxes':>8} {'crowd':>6} {'events':>8} {'us/event':>10}")
+    for size in sizes:
+        for crowd in crowds:
+            tracker = ComponentTracker(CONFIG_PATH)
+            for box_id in range(size):
+                tracker.update_boxes(box_id, (0, 0, 10, 10), (5, 5), start)
+            box_id = size
+            for zone_idx, ((x1, y1), (x2, y2)) in enumerate(tracker.worker_zones):
+                in_zones = [i == zone_idx for i in range(len(tracker.worker_zones))]
+                for role in ('evicted', 'left' if zone_idx else 'inside'):
+                    for _ in range(crowd):
+                        x, y = rng.randint(x1, x2 - 10), rng.randint(y1, y2 - 10)
+                        tracker.update_boxes(box_id, (x, y, x + 10, y + 10), (x + 5, y + 5), start, in_zones=in_zones)
+                        tracker.record_zone_entries(box_id, in_zones, start)
+                        if role == 'evicted':
+                            tracker.evict_box(box_id)
+                        elif role == 'left':
+                            tracker.update_boxes(box_id, (0, 0, 10, 10), (5, 5), start)
+                        box_id += 1
+
+            centroids = [(rng.randint(0, 1280), rng.randint(0, 720)) for _ in range(events)]
+            t0 = time.perf_counter()
+            for c_id, centroid in enumerate(centroids):
+                tracker.assign_component(c_id, start, centroid)
+            elapsed = time.perf_counter() - t0
+            print(f"{size:>8} {crowd:>6} {events:>8} {elapsed / events * 1e6:>10.2f}")
+
+
+def check_geometry(detections=200_000, seed=0):
+    # The batched frame geometry must agree with the per-detection reference functions
+    rng = np.random.default_rng(seed)
+    tracker = ComponentTracker(CONFIG_PATH)
+    xy = rng.integers(-100, 1300, size=(detections, 2))
+    wh = rng.integers(-10, 400, size=(detections, 2))
+    boxes = np.concatenate([xy, xy + wh], axis=1)
+
+    t0 = time.perf_counter()
+    ref_zones = [[is_box_in_zone(tuple(box), zone) for zone in tracker.zone_rects] for box in boxes.tolist()]
+    ref_sides = [tracker.get_side(((x1 + x2) // 2, (y1 + y2) // 2)) for x1, y1, x2, y2 in boxes.tolist()]
+    t_ref = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    vec_zones = boxes_in_zones(boxes, tracker.zone_rects)
+    vec_sides = line_sides(box_centroids(boxes), tracker.middle_line)
+    t_vec = time.perf_counter() - t0
+
+    assert vec_zones.tolist() == [[bool(v) for v in row] for row in ref_zones], "zone containment mismatch"
+    assert vec_sides.tolist() == [bool(v) for v in ref_sides], "middle-line side mismatch"
+    print(f"geometry ok on {detections} boxes: reference {t_ref * 1e3:.1f} ms, vectorized {t_vec * 1e3:.1f} ms")
+
+
+def bench_db_writer(rows=100_000, chunk_size=10_000):
+    # Set-based staging + single upsert per chunk, against a local SQLite file
+    path = "bench_db_writer.sqlite"
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Items (UniqueID TEXT PRIMARY KEY, BoxID TEXT, first_detected TEXT, assignment_method TEXT)")
+    writer = BulkWriter(SqliteBackend(conn), chunk_size=chunk_size)
+    writer.register("Items", ["UniqueID", "BoxID", "first_detected", "assignment_method"], key="UniqueID")
+
+    start = datetime(2025, 6, 15, 8, 0)
+    t0 = time.perf_counter()
+    for i in range(rows):
+        writer.add("Items", (str(i), str(i // 5), start + timedelta(milliseconds=i), "zone"))
+    writer.flush()
+    elapsed = time.perf_counter() - t0
+    count = conn.execute("SELECT COUNT(*) FROM Items").fetchone()[0]
+    conn.close()
+    os.remove(path)
+    assert count == rows, f"expected {rows} rows, found {count}"
+    print(f"db writer: {rows} rows in {elapsed:.2f} s ({rows / elapsed:,.0f} rows/s)")
+
+
+def bench_event_log(rows=1_000_000, seed=0):
+    # Component rows as text CSV vs the binary event log: size, full read, and a memory-mapped column scan
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(2025, 6, 15, 8)
+    frame = pd.DataFrame({
+        "component_id": np.arange(rows), "box_id": pd.array(rng.integers(0, rows // 10, rows), dtype="Int64"),
+        "first_detected": start + pd.to_timedelta(np.sort(rng.uniform(0, rows * 0.05, rows)), unit="s"),
+        "assignment_method": rng.choice(["zone", "middle_line"], rows).astype(object),
+    }).astype({"first_detected": "datetime64[us]"})
+    frame.loc[rng.random(rows) < 0.05, "box_id"] = pd.NA
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path, log_path = os.path.join(tmp, "components.csv"), os.path.join(tmp, "components.trk")
+        writer = EventLogWriter(log_path, "components")
+        writer.write(frame)
+        writer.close()
+        log_to_csv(log_path, csv_path)
+
+        t0 = time.perf_counter()
+        from_csv = pd.read_csv(csv_path, parse_dates=["first_detected"])
+        t_csv = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        from_log = read_log(log_path)
+        t_log = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        _, records = open_log(log_path)
+        zone_share = (records["assignment_method"] == 1).mean()
+        t_map = time.perf_counter() - t0
+
+        assert from_log["box_id"].equals(frame["box_id"]) and (from_log["first_detected"] == frame["first_detected"]).all()
+        assert len(from_csv) == rows
+        print(f"event log on {rows} rows: csv {os.path.getsize(csv_path) / 1e6:.1f} MB read in {t_csv:.2f} s, "
+              f"binary {os.path.getsize(log_path) / 1e6:.1f} MB read in {t_log:.2f} s, "
+              f"memmap column scan {t_map * 1e3:.1f} ms (zone share {zone_share:.2f})")
+        del records
+
+
+def synthetic_shift(rows, seed=0, scan_rate=0.95, jitter=0.5):
+    # rows boxes + components (half each) over a shift, with a barcode read near most scan times
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(2025, 6, 1, 8)
+    n_boxes = rows // 2
+    n_comps = rows - n_boxes
+    span = rows * 3.0
+
+    box_seen = start + pd.to_timedelta(np.sort(rng.uniform(0, span, n_boxes)), unit="s")
+    boxes = pd.DataFrame({"box_id": np.arange(n_boxes), "first_detected": box_seen,
+                          "zone_id": rng.integers(0, 2, n_boxes),
+                          "zone_entry_time": box_seen + pd.to_timedelta(rng.uniform(0, 20, n_boxes), unit="s")})
+    comp_seen = start + pd.to_timedelta(np.sort(rng.uniform(0, span, n_comps)), unit="s")
+    components = pd.DataFrame({"component_id": np.arange(n_boxes, rows), "box_id": rng.integers(0, n_boxes, n_comps),
+                               "first_detected": comp_seen, "assignment_method": "zone",
+                               "line_touch_time": comp_seen + pd.to_timedelta(rng.uniform(0, 20, n_comps), unit="s")})
+    scans = np.concatenate([boxes["zone_entry_time"].to_numpy(), components["line_touch_time"].to_numpy()])
+    scans = scans[rng.random(rows) < scan_rate]
+    read_times = np.sort(scans + pd.to_timedelta(rng.normal(0, jitter, len(scans)), unit="s").to_numpy())
+    reads = pd.DataFrame({"barcode_id": np.arange(len(read_times)),
+                          "barcode": rng.integers(10 ** 11, 10 ** 12, len(read_times)).astype(str),
+                          "time_of_detection": read_times})
+    return boxes, components, reads
+
+
+def bench_barcode_join(rows=1_000_000, tolerance=2.0, chunksize=50_000, seed=0):
+    # Chunked join of a synthetic shift, CSV in/out and (with pyarrow) Parquet in/out
+    boxes, components, reads = synthetic_shift(rows, seed)
+    formats = ["csv", "parquet"] if _pyarrow() else ["csv"]
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in formats:
+            paths = {name: os.path.join(tmp, f"{name}.{fmt}") for name in ("boxes", "components", "reader", "out")}
+            for name, frame in (("boxes", boxes), ("components", components), ("reader", reads)):
+                if fmt == "csv":
+                    frame.to_csv(paths[name], index=False)
+                else:
+                    frame.to_parquet(paths[name], index=False)
+
+            joiner = BarcodeJoiner(tolerance)
+            t0 = time.perf_counter()
+            with RecordWriter(paths["out"]) as writer:
+                for records in join_streams(
+                        joiner,
+                        read_chunks(paths["boxes"], ["first_detected", "zone_entry_time"], chunksize),
+                        read_chunks(paths["components"], ["first_detected", "line_touch_time"], chunksize),
+                        read_chunks(paths["reader"], ["time_of_detection"], chunksize)):
+                    writer.write(records)
+            elapsed = time.perf_counter() - t0
+            stats = joiner.stats()
+            print(f"barcode join ({fmt}): {writer.rows} records in {elapsed:.2f} s "
+                  f"({writer.rows / elapsed:,.0f} records/s), {stats['matched'] / rows:.1%} matched, "
+                  f"peak open window {stats['peak_open']} rows")
+
+        # Status column: the old row-wise apply against the vectorized classify, on the same records
+        frame = pd.read_csv(paths["out"]) if formats[-1] == "csv" else pd.read_parquet(paths["out"])
+
+    def row_status(row):
+        if row["kind"] == "barcode": return "Unmatched barcode"
+        if not pd.isna(row["barcode"]): return "OK"
+        if pd.isna(row["event_time"]): return "Not scanned"
+        return "No box barcode" if row["kind"] == "box" else "No component barcode"
+
+    t0 = time.perf_counter()
+    slow = frame.apply(row_status, axis=1)
+    t_apply = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    fast = classify(frame)
+    t_vec = time.perf_counter() - t0
+    assert (slow.to_numpy() == np.asarray(fast, dtype=object)).all(), "status mismatch"
+    print(f"status on {len(frame)} records: apply {t_apply:.2f} s, vectorized {t_vec * 1e3:.1f} ms")
+
+
+def check_stitching(frames=3_000, objects=40, segment=400, overlap=50, seed=0):
+    # Objects cross the frame over a few hundred frames; every segment's tracker numbers them its own way.
+    # Stitching has to give each object exactly one ID and keep every detection of the core frames.
+    rng = np.random.default_rng(seed)
+    enter = rng.integers(0, frames - 100, objects)
+    life = rng.integers(100, 600, objects)
+    rows = []
+    for obj in range(objects):
+        for frame_idx in range(enter[obj], min(frames, enter[obj] + life[obj])):
+            x = 2 * (frame_idx - enter[obj]) + 30 * obj
+            rows.append((frame_idx, obj % 2, obj, x, 20 * obj, x + 60, 20 * obj + 60))
+    truth = np.array(sorted(rows))
+
+    segments = plan_segments(frames, segment, overlap)
+    results = []
+    for start, _, stop in segments:
+        part = truth[(truth[:, 0] >= start) & (truth[:, 0] < stop)]
+        local = rng.permutation(objects) + 1000
+        jitter = rng.integers(-2, 3, (len(part), 4))
+        results.append((np.arange(start, stop) * 40.0, part[:, 0], part[:, 1], local[part[:, 2]], part[:, 3:] + jitter))
+    t0 = time.perf_counter()
+    (got_frames, _, got_ids, _), stitched = stitch(segments, results)
+    elapsed = time.perf_counter() - t0
+
+    assert np.array_equal(got_frames, truth[:, 0])
+    pairs = set(zip(truth[:, 2].tolist(), got_ids.tolist()))
+    assert len(pairs) == objects == len({g for _, g in pairs}), "an object was split or two were merged"
+    print(f"stitching ok: {objects} objects over {len(segments)} segments, {stitched} joins in {elapsed * 1e3:.1f} ms")
+
+
+EAN_L = ["0001101", "0011001", "0010011", "0111101", "0100011", "0110001", "0101111", "0111011", "0110111", "0001011"]
+EAN_PARITY = ["LLLLLL", "LLGLGG", "LLGGLG", "LLGGGL", "LGLLGG", "LGGLLG", "LGGGLL", "LGLGLG", "LGLGGL", "LGGLGL"]
+
+
+def ean13_image(digits, module=2, height=60):
+    # Black-on-white EAN-13 label for the 12 given digits (check digit added)
+    d = [int(c) for c in digits]
+    d.append((10 - sum(x * (3 if i % 2 else 1) for i, x in enumerate(d)) % 10) % 10)
+    left = [EAN_L[x] if EAN_PARITY[d[0]][i] == "L" else EAN_L[x].translate(str.maketrans("01", "10"))[::-1]
+            for i, x in enumerate(d[1:7])]
+    right = [EAN_L[x].translate(str.maketrans("01", "10")) for x in d[7:]]
+    bits = "101" + "".join(left) + "01010" + "".join(right) + "101"
+    image = np.full((height + 20, len(bits) * module + 40), 255, np.uint8)
+    for i, bit in enumerate(bits):
+        if bit == "1":
+            image[10:10 + height, 20 + i * module:20 + (i + 1) * module] = 0
+    return "".join(map(str, d)), cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+
+
+def bench_barcode_cache(components=20, frames=40, seed=0):
+    # Every component is visible for `frames` frames, mostly motion-blurred. Decoding every sighting
+    # vs. the BarcodeStage's per-track best-crop cache: decodes spent and barcodes read.
+    rng = np.random.default_rng(seed)
+    tracker = ComponentTracker(CONFIG_PATH, barcodes=True)
+    stage = BarcodeStage()
+    start = datetime(2025, 6, 15, 8, 0)
+    naive_decodes = naive_reads = 0
+    truth = {}
+    t_naive = t_stage = 0.0
+    for c_id in range(components):
+        code, label = ean13_image("".join(map(str, rng.integers(0, 10, 12))))
+        truth[c_id] = code
+        h, w = label.shape[:2]
+        naive_read = None
+        for i in range(frames):
+            frame = np.full((480, 640, 3), 128, np.uint8)
+            blur = int(rng.choice([1, 5, 9], p=[0.1, 0.45, 0.45]))
+            frame[200:200 + h, 100:100 + w] = cv2.blur(label, (blur, 1))
+            box = np.array([[100, 200, 100 + w, 200 + h]])
+            t0 = time.perf_counter()
+            naive_read = naive_read or decode_barcode(frame[192:208 + h, 92:108 + w])
+            t_naive += time.perf_counter() - t0
+            naive_decodes += 1
+
+            t0 = time.perf_counter()
+            tracker.update_frame(np.array([1]), np.array([c_id]), box, start + timedelta(milliseconds=40 * i))
+            stage.update(tracker, c_id * frames + i, frame, np.array([1]), np.array([c_id]), box)
+            stage.collect(tracker, wait=True)
+            t_stage += time.perf_counter() - t0
+        naive_reads += naive_read is not None
+    stage.close(tracker)
+    got = tracker.components_df.set_index("component_id")["barcode"]
+    stats = stage.stats()
+    # UPC-A labels (leading 0) come back as 12 digits
+    stage_reads = sum(got.get(c_id) in (code, code[1:]) for c_id, code in truth.items())
+    print(f"barcodes every sighting: {naive_decodes} decodes, {naive_reads}/{components} read, {t_naive:.2f} s")
+    print(f"barcodes best-crop cache: {stats['decodes']} decodes, {stage_reads}/{components} read, {t_stage:.2f} s")
+
+
+if __name__ == "__main__":
+    check_geometry()
+    check_stitching()
+    bench_zone_updates()
+    bench_assignment()
+    bench_db_writer()
+    bench_event_log()
+    bench_barcode_join()
+    bench_barcode_cache()
@@ -0,0 +1,248 @@
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+# ────────────────────────────────────────────────
+# SQL‑SERVER CONNECTION SETTINGS ─ the one place all writers read them from.
+# Override per machine with db_config.json (same keys) or TRACKER_DB_<KEY> environment variables.
+# ────────────────────────────────────────────────
+DB_CONFIG = {
+    "driver": "ODBC Driver 17 for SQL Server",
+    "server": "CUIDADO\\SQLEXPRESS",
+    "database": "Logical DB",
+    "trusted_connection": "yes",
+    "uid": None,
+    "pwd": None,
+    "pool_size": 4,
+    "connect_retries": 3,
+    "retry_backoff": 0.5,
+    "health_check_after": 30.0,
+    "commit_every": 500,
+}
+CONFIG_PATH = "db_config.json"
+
+
+def load_db_config(path=CONFIG_PATH):
+    config = dict(DB_CONFIG)
+    if os.path.exists(path):
+        with open(path) as f:
+            config.update(json.load(f))
+    for key, default in DB_CONFIG.items():
+        value = os.environ.get(f"TRACKER_DB_{key.upper()}")
+        if value is not None:
+            config[key] = type(default)(value) if isinstance(default, (int, float)) else value
+    return config
+
+
+def connection_string(config):
+    parts = [f"DRIVER={{{config['driver']}}}", f"SERVER={config['server']}", f"DATABASE={config['database']}"]
+    if config.get("uid"):
+        parts += [f"UID={config['uid']}", f"PWD={config['pwd'] or ''}"]
+    else:
+        parts.append(f"Trusted_Connection={config['trusted_connection']}")
+    return ";".join(parts) + ";"
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+class ConnectionPool:
+    # Keeps up to `size` open connections. Connections idle for longer than health_check_after seconds
+    # are pinged before reuse and replaced if dead; new connections are retried with exponential backoff.
+    def __init__(self, connect, size=4, retries=3, backoff=0.5, max_backoff=8.0, health_check_after=30.0,
+                 health_check_sql="SELECT 1", timeout=30.0):
+        self.connect = connect
+        self.size = size
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.health_check_after = health_check_after
+        self.health_check_sql = health_check_sql
+        self.timeout = timeout
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def _open(self):
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            try:
+                return self.connect()
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                print(f"⚠️ DB connect failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def _healthy(self, conn):
+        try:
+            cur = conn.cursor()
+            cur.execute(self.health_check_sql)
+            cur.fetchall()
+            cur.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self.lock:
+            self.opened -= 1
+
+    def acquire(self):
+        while True:
+            try:
+                conn, last_used = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if time.monotonic() - last_used < self.health_check_after or self._healthy(conn):
+                return conn
+            self._discard(conn)
+
+        with self.lock:
+            can_open = self.opened < self.size
+            if can_open:
+                self.opened += 1
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self.lock:
+                    self.opened -= 1
+                raise
+        try:
+            conn, _ = self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"No DB connection free after {self.timeout}s (pool size {self.size})")
+        return conn
+
+    def release(self, conn, broken=False):
+        if broken:
+            self._discard(conn)
+        else:
+            self.idle.put((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        # Rolls back on error; a connection that fails even to roll back is dropped from the pool
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            broken = False
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            self.release(conn, broken=broken)
+            raise
+        self.release(conn)
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            yield conn
+            conn.commit()
+
+    def run(self, fn, retries=None):
+        # Runs fn(conn) in a transaction, retrying on a fresh connection with backoff if it fails
+        retries = self.retries if retries is None else retries
+        delay = self.backoff
+        for attempt in range(retries + 1):
+            try:
+                with self.transaction() as conn:
+                    return fn(conn)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                print(f"⚠️ DB write failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def batch(self, commit_every=500):
+        return TransactionBatch(self, commit_every)
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
+
+
+class TransactionBatch:
+    # Groups single-row statements into transactions of commit_every statements instead of committing each one
+    def __init__(self, pool, commit_every=500):
+        self.pool = pool
+        self.commit_every = commit_every
+        self.conn = None
+        self.cursor = None
+        self.statements = 0
+
+    def execute(self, sql, *params):
+        if self.conn is None:
+            self.conn = self.pool.acquire()
+            self.cursor = self.conn.cursor()
+        self.cursor.execute(sql, *params)
+        self.statements += 1
+        if self.statements >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        if self.conn is None:
+            return
+        self.conn.commit()
+        self.cursor.close()
+        self.pool.release(self.conn)
+        self.conn = self.cursor = None
+        self.statements = 0
+
+    def rollback(self):
+        if self.conn is None:
+            return
+        try:
+            self.conn.rollback()
+            self.pool.release(self.conn)
+        except Exception:
+            self.pool.release(self.conn, broken=True)
+        self.conn = self.cursor = None
+        self.statements = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(config=None):
+    # Process-wide pool built from load_db_config(); pyodbc is only imported when a connection is needed
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            config = config or load_db_config()
+            conn_str = connection_string(config)
+
+            def connect():
+                import pyodbc
+                return pyodbc.connect(conn_str, autocommit=False)
+
+            _pool = ConnectionPool(connect, size=config["pool_size"], retries=config["connect_retries"],
+                                   backoff=config["retry_backoff"], health_check_after=config["health_check_after"])
+        return _pool
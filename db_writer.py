@@ -0,0 +1,149 @@
+import math
+import re
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Tracker output table -> (target table, target columns, key, target column -> tracker column or constant)
+TRACKER_TABLES = {
+    "boxes": ("dbo.Boxes", ["UniqueID", "BoxID", "first_detected", "zone_id", "TimeAtLocation1", "Barcodo"], "UniqueID", {
+        "UniqueID": "box_id", "BoxID": "box_id", "first_detected": "first_detected",
+        "zone_id": "zone_id", "TimeAtLocation1": "zone_entry_time", "Barcodo": None,
+    }),
+    "components": ("dbo.Items", ["UniqueID", "BoxID", "first_detected", "assignment_method"], "UniqueID", {
+        "UniqueID": "component_id", "BoxID": "box_id", "first_detected": "first_detected",
+        "assignment_method": "assignment_method",
+    }),
+}
+
+
+def _clean(value):
+    # pyodbc / sqlite3 only take plain Python values
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.to_pydatetime()
+    if isinstance(value, np.generic):
+        return _clean(value.item())
+    return value
+
+
+def _ident(name):
+    if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?", name):
+        raise ValueError(f"Unsafe SQL identifier: {name}")
+    return name
+
+
+class SqlServerBackend:
+    # Stages each chunk into a #temp table with fast_executemany, then applies one set-based MERGE
+    def __init__(self, conn):
+        self.conn = conn
+
+    def upsert(self, table, columns, key, rows, update=True):
+        table = _ident(table)
+        cols = ", ".join(_ident(c) for c in columns)
+        stage = "#stage_" + table.split(".")[-1]
+        cur = self.conn.cursor()
+        cur.fast_executemany = True
+        try:
+            cur.execute(f"SELECT TOP 0 {cols} INTO {stage} FROM {table}")
+            cur.executemany(f"INSERT INTO {stage} ({cols}) VALUES ({', '.join('?' for _ in columns)})", rows)
+            on = " AND ".join(f"tgt.{k} = src.{k}" for k in key)
+            sql = f"MERGE {table} WITH (HOLDLOCK) AS tgt USING {stage} AS src ON {on}"
+            updates = [c for c in columns if c not in key]
+            if update and updates:
+                sql += " WHEN MATCHED THEN UPDATE SET " + ", ".join(f"{c} = src.{c}" for c in updates)
+            sql += f" WHEN NOT MATCHED THEN INSERT ({cols}) VALUES ({', '.join('src.' + c for c in columns)});"
+            cur.execute(sql)
+        finally:
+            cur.execute(f"IF OBJECT_ID('tempdb..{stage}') IS NOT NULL DROP TABLE {stage}")
+            cur.close()
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+
+class SqliteBackend:
+    # Same staging + single upsert statement, for running the writer locally without SQL Server
+    def __init__(self, conn):
+        self.conn = conn
+
+    def upsert(self, table, columns, key, rows, update=True):
+        table = _ident(table)
+        cols = ", ".join(_ident(c) for c in columns)
+        stage = "stage_" + table
+        rows = [[v.isoformat(sep=" ") if isinstance(v, datetime) else v for v in row] for row in rows]
+        cur = self.conn.cursor()
+        try:
+            cur.execute(f"CREATE TEMP TABLE {stage} AS SELECT {cols} FROM {table} WHERE 0")
+            cur.executemany(f"INSERT INTO {stage} ({cols}) VALUES ({', '.join('?' for _ in columns)})", rows)
+            updates = [c for c in columns if c not in key]
+            if update and updates:
+                conflict = "DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in updates)
+            else:
+                conflict = "DO NOTHING"
+            cur.execute(f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {stage} WHERE true "
+                        f"ON CONFLICT ({', '.join(key)}) {conflict}")
+        finally:
+            cur.execute(f"DROP TABLE IF EXISTS temp.{stage}")
+            cur.close()
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+
+class BulkWriter:
+    # Buffers rows per target table and writes them in chunks through a backend, committing once per flush.
+    # Rows with a key already staged in the same flush are dropped (first one wins, like drop_duplicates(keep='first')).
+    def __init__(self, backend=None, chunk_size=10_000):
+        self.backend = backend
+        self.chunk_size = chunk_size
+        self.tables = {}
+        self.pending = {}
+
+    def register(self, table, columns, key, update=True):
+        key = [key] if isinstance(key, str) else list(key)
+        self.tables[table] = (list(columns), key, update)
+        self.pending[table] = {}
+
+    def add(self, table, row):
+        columns, key, _ = self.tables[table]
+        values = tuple(_clean(row[c]) for c in columns) if isinstance(row, dict) else tuple(_clean(v) for v in row)
+        row_key = tuple(values[columns.index(k)] for k in key)
+        self.pending[table].setdefault(row_key, values)
+
+    def add_frame(self, table, frame, mapping=None):
+        # mapping: target column -> frame column (or a constant when the name is not a frame column)
+        columns, _, _ = self.tables[table]
+        mapping = mapping or {c: c for c in columns}
+        data = [frame[mapping[c]].tolist() if mapping[c] in frame.columns else [mapping[c]] * len(frame)
+                for c in columns]
+        for row in zip(*data):
+            self.add(table, row)
+
+    def pending_rows(self):
+        return sum(len(rows) for rows in self.pending.values())
+
+    def flush(self, backend=None):
+        # backend overrides the default one, e.g. a backend around a connection checked out of a pool
+        backend = backend or self.backend
+        try:
+            for table, (columns, key, update) in self.tables.items():
+                rows = list(self.pending[table].values())
+                for start in range(0, len(rows), self.chunk_size):
+                    backend.upsert(table, columns, key, rows[start:start + self.chunk_size], update)
+            backend.commit()
+        except Exception:
+            backend.rollback()
+            raise
+        for table in self.pending:
+            self.pending[table].clear()
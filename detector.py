@@ -0,0 +1,182 @@
+import argparse
+import glob
+import json
+import os
+import time
+
+# ────────────────────────────────────────────────
+# DETECTOR SETTINGS ─ which runtime the trackers load the trained weights with.
+# Override per machine with detector_config.json (same keys) or TRACKER_DETECTOR_<KEY> environment variables.
+#   backend: pytorch (the .pt checkpoint), onnx (ONNX Runtime) or openvino — the last two run the model
+#            exported by `python detector.py export`, INT8-quantized when int8 is set
+# ────────────────────────────────────────────────
+DETECTOR_CONFIG = {
+    "backend": "pytorch",
+    "weights": "run/train5/weights/best.pt",
+    "int8": False,
+    "imgsz": 640,
+    # Roboflow export used for training (YOLOv8 format, unzipped into roboflow_dataset/); its images
+    # calibrate INT8 and its labels score the report
+    "data": "roboflow_dataset/data.yaml",
+}
+CONFIG_PATH = "detector_config.json"
+BACKENDS = ("pytorch", "onnx", "openvino")
+
+
+def load_detector_config(path=CONFIG_PATH):
+    config = dict(DETECTOR_CONFIG)
+    if os.path.exists(path):
+        with open(path) as f:
+            config.update(json.load(f))
+    for key, default in DETECTOR_CONFIG.items():
+        value = os.environ.get(f"TRACKER_DETECTOR_{key.upper()}")
+        if value is None:
+            continue
+        if isinstance(default, bool):
+            config[key] = value.lower() in ("1", "true", "yes")
+        elif isinstance(default, (int, float)):
+            config[key] = type(default)(value)
+        else:
+            config[key] = value
+    if config["backend"] not in BACKENDS:
+        raise ValueError(f"Unknown detector backend {config['backend']!r}, expected one of {BACKENDS}")
+    return config
+
+
+def model_path(config):
+    # Where `export` leaves the model for the configured backend (ultralytics' own naming)
+    stem = os.path.splitext(config["weights"])[0]
+    if config["backend"] == "onnx":
+        return stem + ("_int8" if config["int8"] else "") + ".onnx"
+    if config["backend"] == "openvino":
+        return stem + ("_int8" if config["int8"] else "") + "_openvino_model"
+    return config["weights"]
+
+
+def dataset_yaml(config):
+    data = config["data"]
+    if not os.path.exists(data):
+        raise FileNotFoundError(f"No dataset at {data}; download the Roboflow export (YOLOv8 format) and unzip it "
+                                f"into roboflow_dataset/ (`unzip dataset.zip -d roboflow_dataset`), or pass --data")
+    return data
+
+
+def export_detector(config):
+    from ultralytics import YOLO
+
+    if config["backend"] == "pytorch":
+        return config["weights"]
+    # dynamic input size, so the ROI crop's imgsz works with exported models too
+    kwargs = {"format": config["backend"], "imgsz": config["imgsz"], "dynamic": True}
+    if config["int8"]:
+        kwargs.update(int8=True, data=dataset_yaml(config))
+    exported = YOLO(config["weights"]).export(**kwargs)
+    target = model_path(config)
+    if os.path.normpath(exported) != os.path.normpath(target):
+        os.replace(exported, target)
+    return target
+
+
+def load_detector(config=None, weights=None):
+    # weights (a path) bypasses the config, as the old YOLO(weights) calls did
+    from ultralytics import YOLO
+
+    if weights is not None:
+        return YOLO(weights, task="detect")
+    config = config or load_detector_config()
+    path = model_path(config)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No {config['backend']} model at {path}; run `python detector.py export` first")
+    return YOLO(path, task="detect")
+
+
+def sample_images(data, limit):
+    # Validation images of a YOLO data.yaml (falls back to the training split)
+    from ultralytics.data.utils import check_det_dataset
+
+    dataset = check_det_dataset(data)
+    for split in ("val", "test", "train"):
+        folders = dataset.get(split)
+        if not folders:
+            continue
+        images = []
+        for folder in folders if isinstance(folders, list) else [folders]:
+            images += sorted(glob.glob(os.path.join(folder, "*.jpg")) + glob.glob(os.path.join(folder, "*.png")))
+        if images:
+            return images[:limit]
+    raise FileNotFoundError(f"No images found for {data}")
+
+
+def benchmark_detector(model, images, imgsz, warmup=5):
+    import cv2
+
+    frames = [cv2.imread(path) for path in images]
+    for frame in frames[:warmup]:
+        model.predict(frame, imgsz=imgsz, verbose=False)
+    t0 = time.perf_counter()
+    for frame in frames:
+        model.predict(frame, imgsz=imgsz, verbose=False)
+    return len(frames) / (time.perf_counter() - t0)
+
+
+def report(config, backends=BACKENDS, images=100, output="detector_report.json"):
+    # Accuracy (mAP on the dataset's validation split) and single-frame CPU FPS of every backend that has
+    # an exported model, next to the PyTorch checkpoint
+    sample = sample_images(dataset_yaml(config), images)
+    rows = []
+    for backend in backends:
+        for int8 in ((False,) if backend == "pytorch" else (False, True)):
+            variant = dict(config, backend=backend, int8=int8)
+            path = model_path(variant)
+            if not os.path.exists(path):
+                continue
+            model = load_detector(variant)
+            metrics = model.val(data=config["data"], imgsz=config["imgsz"], device="cpu", verbose=False, plots=False)
+            model = load_detector(variant)
+            rows.append({
+                "backend": backend, "int8": int8, "model": path,
+                "map50": round(float(metrics.box.map50), 4), "map50_95": round(float(metrics.box.map), 4),
+                "fps": round(benchmark_detector(model, sample, config["imgsz"]), 2),
+            })
+    base = next((row for row in rows if row["backend"] == "pytorch"), None)
+    print(f"{'backend':>10} {'int8':>5} {'mAP50':>7} {'mAP50-95':>9} {'FPS':>7} {'speedup':>8}")
+    for row in rows:
+        if base is not None:
+            row["speedup"] = round(row["fps"] / base["fps"], 2)
+            row["map50_95_delta"] = round(row["map50_95"] - base["map50_95"], 4)
+        print(f"{row['backend']:>10} {str(row['int8']):>5} {row['map50']:>7.3f} {row['map50_95']:>9.3f} "
+              f"{row['fps']:>7.1f} {row.get('speedup', 1.0):>7.2f}x")
+    with open(output, "w") as f:
+        json.dump(rows, f, indent=2)
+    print(f"✅ Report saved as '{output}'")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the detector for CPU runtimes and compare them")
+    parser.add_argument("command", choices=("export", "report"))
+    parser.add_argument("--config", default=CONFIG_PATH, help="detector settings JSON")
+    parser.add_argument("--backend", choices=BACKENDS, help="override the configured backend")
+    parser.add_argument("--int8", action="store_true", help="INT8 post-training quantization (calibrated on --data)")
+    parser.add_argument("--data", help="dataset YAML for calibration / validation (default: roboflow_dataset/data.yaml, "
+                                       "from the Roboflow export unzipped into roboflow_dataset/)")
+    parser.add_argument("--images", type=int, default=100, help="frames timed per backend in the report")
+    parser.add_argument("--output", default="detector_report.json")
+    args = parser.parse_args()
+
+    config = load_detector_config(args.config)
+    if args.backend:
+        config["backend"] = args.backend
+    if args.int8:
+        config["int8"] = True
+    if args.data:
+        config["data"] = args.data
+
+    if args.command == "export":
+        print(f"✅ {config['backend']} model ready at '{export_detector(config)}'")
+    else:
+        report(config, images=args.images, output=args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+
+class ColumnarBuffer:
+    # Append-only table kept as one growable object array per column.
+    # Rows are appended in amortized O(1); a DataFrame is only built on demand.
+    # With a key column, rows can also be found and updated by key in O(1).
+    def __init__(self, columns, key=None, capacity=1024):
+        self.columns = list(columns)
+        self.key = key
+        self._slots = {}
+        self._capacity = max(1, capacity)
+        self._size = 0
+        self._data = {c: np.empty(self._capacity, dtype=object) for c in self.columns}
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self):
+        self._capacity *= 2
+        for c in self.columns:
+            column = np.empty(self._capacity, dtype=object)
+            column[:self._size] = self._data[c][:self._size]
+            self._data[c] = column
+
+    def append(self, row):
+        if self._size == self._capacity:
+            self._grow()
+        slot = self._size
+        for c in self.columns:
+            self._data[c][slot] = row.get(c)
+        self._size += 1
+        if self.key is not None:
+            self._slots[row.get(self.key)] = slot
+        return slot
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def slot_of(self, key):
+        return self._slots.get(key)
+
+    def row(self, slot):
+        return {c: self._data[c][slot] for c in self.columns}
+
+    def column(self, name):
+        return self._data[name][:self._size]
+
+    def set(self, slot, values):
+        for c, v in values.items():
+            self._data[c][slot] = v
+
+    def update(self, key, values):
+        slot = self._slots.get(key)
+        if slot is None:
+            return False
+        self.set(slot, values)
+        return True
+
+    def take(self, mask):
+        # Removes the rows where mask is set and returns them as a DataFrame; the remaining rows keep their order
+        mask = np.asarray(mask, dtype=bool)
+        size = self._size
+        frame = pd.DataFrame({c: self._data[c][:size][mask] for c in self.columns}, columns=self.columns, dtype=object)
+        keep = ~mask
+        rest = int(keep.sum())
+        for c in self.columns:
+            column = self._data[c]
+            column[:rest] = column[:size][keep]
+            column[rest:size] = None
+        if self.key is not None:
+            new_slots = np.cumsum(keep) - 1
+            self._slots = {key: int(new_slots[slot]) for key, slot in self._slots.items() if keep[slot]}
+        self._size = rest
+        return frame
+
+    def clear(self):
+        for c in self.columns:
+            self._data[c][:self._size] = None
+        self._size = 0
+        self._slots.clear()
+
+    def to_frame(self):
+        return pd.DataFrame({c: self._data[c][:self._size] for c in self.columns}, columns=self.columns, dtype=object)
@@ -0,0 +1,172 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+# Fixed-width little-endian records: timestamps are int64 microseconds since the epoch (naive wall
+# clock, like the CSVs), IDs int32. Missing IDs are -1 and missing timestamps NaT (int64 min), so a
+# file can be memory-mapped and its columns used directly as numpy arrays.
+HEADER = np.dtype([("magic", "S6"), ("version", "<u2"), ("table", "S16")])
+MAGIC = b"TRKLOG"
+VERSION = 1
+NULL_ID = -1
+NAT = np.iinfo(np.int64).min
+
+RECORDS = {
+    "boxes": np.dtype([("box_id", "<i4"), ("first_detected", "<i8"), ("zone_id", "<i4"), ("zone_entry_time", "<i8")]),
+    "components": np.dtype([("component_id", "<i4"), ("box_id", "<i4"), ("first_detected", "<i8"),
+                            ("assignment_method", "u1")]),
+}
+# CSV column order per table (same as CsvSink / save_to_csv)
+COLUMNS = {
+    "boxes": ["box_id", "first_detected", "zone_id", "zone_entry_time"],
+    "components": ["component_id", "box_id", "first_detected", "assignment_method"],
+}
+ID_COLUMNS = {"box_id", "component_id", "zone_id"}
+TIME_COLUMNS = {"first_detected", "zone_entry_time"}
+# assignment_method is stored as an index into this tuple
+METHODS = (None, "zone", "middle_line")
+
+
+def encode(table, frame):
+    records = np.zeros(len(frame), dtype=RECORDS[table])
+    for col in COLUMNS[table]:
+        values = frame[col]
+        if col in ID_COLUMNS:
+            ids = pd.to_numeric(values, errors="coerce").fillna(NULL_ID).to_numpy(np.int64)
+            if len(ids) and (ids.max() > np.iinfo(np.int32).max or ids.min() < NULL_ID):
+                raise ValueError(f"{table}.{col} has IDs outside the int32 range")
+            records[col] = ids
+        elif col in TIME_COLUMNS:
+            records[col] = pd.to_datetime(values, errors="coerce").to_numpy("datetime64[us]").view(np.int64)
+        else:
+            codes = pd.Series(values, dtype=object).map({m: i for i, m in enumerate(METHODS)})
+            if codes.isna().any():
+                raise ValueError(f"Unknown {col} values: {sorted(set(values[codes.isna()]))}")
+            records[col] = codes.to_numpy(np.uint8)
+    return records
+
+
+def decode(table, records):
+    # Typed frame: Int64 IDs (NA for -1), datetime64[us] timestamps, assignment_method as text
+    data = {}
+    for col in COLUMNS[table]:
+        values = np.asarray(records[col])
+        if col in ID_COLUMNS:
+            data[col] = pd.arrays.IntegerArray(values.astype(np.int64), values == NULL_ID)
+        elif col in TIME_COLUMNS:
+            data[col] = values.astype(np.int64).view("datetime64[us]")
+        else:
+            data[col] = np.asarray(METHODS, dtype=object)[values]
+    return pd.DataFrame(data, columns=COLUMNS[table])
+
+
+def _header(table):
+    header = np.zeros(1, dtype=HEADER)
+    header[0] = (MAGIC, VERSION, table.encode())
+    return header.tobytes()
+
+
+def read_header(path):
+    # Table name of a log, after checking its magic and version
+    with open(path, "rb") as f:
+        header = np.frombuffer(f.read(HEADER.itemsize), dtype=HEADER)
+    if len(header) != 1 or header[0]["magic"] != MAGIC:
+        raise ValueError(f"{path} is not a tracker event log")
+    if header[0]["version"] != VERSION:
+        raise ValueError(f"{path} has event log version {header[0]['version']}, expected {VERSION}")
+    return header[0]["table"].decode()
+
+
+def open_log(path):
+    # Returns (table, records) with records a read-only numpy.memmap; a torn last record is ignored
+    table = read_header(path)
+    dtype = RECORDS[table]
+    count = (os.path.getsize(path) - HEADER.itemsize) // dtype.itemsize
+    if count == 0:
+        return table, np.zeros(0, dtype=dtype)
+    return table, np.memmap(path, dtype=dtype, mode="r", offset=HEADER.itemsize, shape=(count,))
+
+
+def read_log(path):
+    table, records = open_log(path)
+    return decode(table, records)
+
+
+class EventLogWriter:
+    # Starts a new log (like the CSV output, a run replaces the previous one's file). With append, records
+    # go after those already in the file, which must be a log of the same table and version.
+    def __init__(self, path, table, append=False):
+        self.table = table
+        if append and os.path.exists(path) and os.path.getsize(path):
+            existing = read_header(path)
+            if existing != table:
+                raise ValueError(f"{path} is a {existing} log, not {table}")
+        self.file = open(path, "ab" if append else "wb")
+        if self.file.tell() == 0:
+            self.file.write(_header(table))
+
+    def write(self, frame):
+        if len(frame):
+            self.file.write(encode(self.table, frame).tobytes())
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def _csv_text(table, frame):
+    # Same text the CSV sink writes: str(datetime) per value (no ".000000"), empty for missing values
+    out = frame.copy()
+    for col in COLUMNS[table]:
+        if col in TIME_COLUMNS:
+            times = out[col]
+            text = times.dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+            whole = times.dt.microsecond == 0
+            text[whole] = times[whole].dt.strftime("%Y-%m-%d %H:%M:%S")
+            out[col] = text
+    return out
+
+
+def log_to_csv(log_path, csv_path, chunk_rows=500_000):
+    table, records = open_log(log_path)
+    for start in range(0, max(len(records), 1), chunk_rows):
+        frame = _csv_text(table, decode(table, records[start:start + chunk_rows]))
+        frame.to_csv(csv_path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+    return table, len(records)
+
+
+def csv_to_log(csv_path, log_path, table=None, chunk_rows=500_000):
+    # The table is recognised from the CSV header unless given
+    if table is None:
+        header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+        table = next((name for name, cols in COLUMNS.items() if cols == header), None)
+        if table is None:
+            raise ValueError(f"{csv_path} does not have a boxes or components header")
+    writer = EventLogWriter(log_path, table)
+    rows = 0
+    for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, dtype={"assignment_method": object}):
+        if table == "components":
+            chunk["assignment_method"] = chunk["assignment_method"].where(chunk["assignment_method"].notna(), None)
+        writer.write(chunk)
+        rows += len(chunk)
+    writer.close()
+    return table, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert tracker output between CSV and the binary event log")
+    parser.add_argument("source", help=".csv or .trk file")
+    parser.add_argument("target", help=".trk or .csv file")
+    args = parser.parse_args()
+    if args.source.endswith(".csv"):
+        table, rows = csv_to_log(args.source, args.target)
+    else:
+        table, rows = log_to_csv(args.source, args.target)
+    print(f"✅ {rows} {table} rows: {args.source} -> {args.target} "
+          f"({os.path.getsize(args.source):,} -> {os.path.getsize(args.target):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import cv2
+
+
+class FrameSyncError(RuntimeError):
+    pass
+
+
+class FrameSource:
+    # Decodes a video exactly once; every consumer (tracker, writer) gets the same ndarray.
+    # start_frame / stop_frame restrict it to a segment; frame indices stay those of the whole video.
+    def __init__(self, video_path, start_frame=0, stop_frame=None):
+        self.video_path = video_path
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video: {video_path}")
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.start_frame = start_frame
+        self.stop_frame = stop_frame
+        if start_frame:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    def __iter__(self):
+        frame_idx = self.start_frame
+        while self.stop_frame is None or frame_idx < self.stop_frame:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            yield frame_idx, frame
+            frame_idx += 1
+
+    def position_ms(self, frame_idx):
+        # Presentation time of the frame just read; containers without timestamps fall back to frame_idx / fps
+        position = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        if position <= 0 and frame_idx > 0:
+            position = frame_idx * 1000 / self.fps if self.fps > 0 else 0.0
+        return position
+
+    def open_writer(self, output_path, fourcc='mp4v'):
+        return cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), self.fps, (self.width, self.height))
+
+    def release(self):
+        self.cap.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class FrameSync:
+    # Guards the frame/result pairing: results must arrive one per frame, in order, for the same image
+    def __init__(self):
+        self.next_idx = 0
+
+    def check(self, frame_idx, frame, result):
+        if frame_idx != self.next_idx:
+            raise FrameSyncError(f"Result for frame {frame_idx} arrived, expected frame {self.next_idx}")
+        if tuple(result.orig_shape) != tuple(frame.shape[:2]):
+            raise FrameSyncError(f"Frame {frame_idx} is {frame.shape[:2]} but its result is for {result.orig_shape}")
+        self.next_idx += 1
+
+    def skip(self, frame_idx):
+        # A frame the detector deliberately did not see still has to arrive in order
+        if frame_idx != self.next_idx:
+            raise FrameSyncError(f"Skipped frame {frame_idx} arrived, expected frame {self.next_idx}")
+        self.next_idx += 1
+
+
+def track_frames(model, frames, **track_kwargs):
+    # Runs the tracker on already-decoded frames and yields (frame_idx, frame, result)
+    sync = FrameSync()
+    for frame_idx, frame in frames:
+        results = model.track(frame, persist=True, verbose=False, **track_kwargs)
+        if len(results) != 1:
+            raise FrameSyncError(f"Expected one result for frame {frame_idx}, got {len(results)}")
+        sync.check(frame_idx, frame, results[0])
+        yield frame_idx, frame, results[0]
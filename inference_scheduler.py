@@ -0,0 +1,131 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+from ultralytics.trackers.track import TRACKER_MAP
+from ultralytics.utils import YAML, IterableSimpleNamespace
+from ultralytics.utils.checks import check_yaml
+
+_STOP = object()
+
+
+class InferenceRequest:
+    def __init__(self, stream_id, frame_idx, frame, predict_kwargs=None):
+        self.stream_id = stream_id
+        self.frame_idx = frame_idx
+        self.frame = frame
+        self.predict_kwargs = predict_kwargs or {}
+        self.future = Future()
+
+
+class BatchScheduler:
+    # Collects frames from any number of streams into batches of up to batch_size, waiting at most
+    # max_wait seconds for a batch to fill, and runs the detector once per batch. Each stream keeps its
+    # own tracker (same one model.track would use), so detections go back to the right track state.
+    # batch_size=1 / max_wait=0 gives the lowest latency; larger values trade latency for throughput.
+    def __init__(self, model, batch_size=8, max_wait=0.02, tracker="botsort.yaml", **predict_kwargs):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self.tracker_cfg = IterableSimpleNamespace(**YAML.load(check_yaml(tracker)))
+        self.predict_kwargs = predict_kwargs
+        self.trackers = {}
+        self.requests = queue.Queue()
+        self.thread = threading.Thread(target=self._loop, name="inference-scheduler", daemon=True)
+        self.batches = 0
+        self.frames = 0
+        self.busy = 0.0
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def close(self):
+        self.requests.put(_STOP)
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, stream_id, frame_idx, frame, **predict_kwargs):
+        # Frames of one stream must be submitted in order; results resolve in the same order.
+        # predict_kwargs (e.g. a stream's ROI imgsz) override the scheduler's for this frame.
+        request = InferenceRequest(stream_id, frame_idx, frame, predict_kwargs)
+        self.requests.put(request)
+        return request.future
+
+    def track(self, stream_id, frame_idx, frame, **predict_kwargs):
+        return self.submit(stream_id, frame_idx, frame, **predict_kwargs).result()
+
+    @property
+    def mean_batch_size(self):
+        return self.frames / self.batches if self.batches else 0.0
+
+    def stats(self):
+        return {'batches': self.batches, 'frames': self.frames, 'mean_batch_size': round(self.mean_batch_size, 2),
+                'fps': round(self.frames / self.busy, 2) if self.busy else 0.0}
+
+    def _collect(self):
+        first = self.requests.get()
+        if first is _STOP:
+            return None, True
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self.requests.get(timeout=remaining) if remaining > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is _STOP:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._collect()
+            if not batch:
+                continue
+            # One predict call per set of kwargs: a batch shares its inference size
+            groups = {}
+            for r in batch:
+                groups.setdefault(tuple(sorted(r.predict_kwargs.items())), []).append(r)
+            for group in groups.values():
+                self._run(group)
+
+    def _run(self, batch):
+        t0 = time.perf_counter()
+        try:
+            kwargs = {**self.predict_kwargs, **batch[0].predict_kwargs}
+            results = self.model.predict([r.frame for r in batch], verbose=False, **kwargs)
+            tracked = [self._track(r.stream_id, result) for r, result in zip(batch, results)]
+        except BaseException as e:
+            for r in batch:
+                r.future.set_exception(e)
+            return
+        finally:
+            self.busy += time.perf_counter() - t0
+        self.batches += 1
+        self.frames += len(batch)
+        for r, result in zip(batch, tracked):
+            r.future.set_result(result)
+
+    def _track(self, stream_id, result):
+        # Mirrors ultralytics' on_predict_postprocess_end for one stream's tracker
+        tracker = self.trackers.get(stream_id)
+        if tracker is None:
+            tracker = self.trackers[stream_id] = TRACKER_MAP[self.tracker_cfg.tracker_type](args=self.tracker_cfg)
+        det = result.boxes.cpu().numpy()
+        tracks = tracker.update(det, result.orig_img)
+        if len(tracks) == 0:
+            return result[:0] if any(not t.is_activated for t in tracker.tracked_stracks) else result
+        result = result[tracks[:, -1].astype(int)]
+        result.update(boxes=torch.as_tensor(tracks[:, :-1], device=result.boxes.data.device))
+        return result
@@ -0,0 +1,228 @@
+import bisect
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets (seconds) for the stage histograms
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class NullMetrics:
+    # Default: every call is a no-op, so instrumented code costs one method call when metrics are off
+    enabled = False
+
+    def inc(self, name, value=1, **labels):
+        pass
+
+    def set(self, name, value, **labels):
+        pass
+
+    def observe(self, name, seconds, **labels):
+        pass
+
+    def gauge_fn(self, name, fn, **labels):
+        pass
+
+    def with_labels(self, **labels):
+        return self
+
+
+NULL_METRICS = NullMetrics()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    # Label values may be file paths (the default source), so backslashes and quotes are escaped
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series(name, labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return name
+    return name + "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+
+class LabelledMetrics:
+    # View of a registry that adds fixed labels (e.g. source=<camera>) to every series, so several streams
+    # can share one registry without overwriting each other's gauges
+    enabled = True
+
+    def __init__(self, registry, labels):
+        self.registry = registry
+        self.labels = labels
+
+    def inc(self, name, value=1, **labels):
+        self.registry.inc(name, value, **self.labels, **labels)
+
+    def set(self, name, value, **labels):
+        self.registry.set(name, value, **self.labels, **labels)
+
+    def observe(self, name, seconds, **labels):
+        self.registry.observe(name, seconds, **self.labels, **labels)
+
+    def gauge_fn(self, name, fn, **labels):
+        self.registry.gauge_fn(name, fn, **self.labels, **labels)
+
+    def with_labels(self, **labels):
+        return LabelledMetrics(self.registry, {**self.labels, **labels})
+
+
+class MetricsRegistry:
+    # Counters, gauges and latency histograms, keyed by name + labels. gauge_fn registers a callable that is
+    # only read when metrics are collected (queue depths, track counts), so it costs nothing per frame.
+    enabled = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.gauge_fns = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def gauge_fn(self, name, fn, **labels):
+        with self.lock:
+            self.gauge_fns[_key(name, labels)] = fn
+
+    def with_labels(self, **labels):
+        return LabelledMetrics(self, labels)
+
+    def _gauges(self):
+        gauges = dict(self.gauges)
+        for key, fn in self.gauge_fns.items():
+            try:
+                gauges[key] = fn()
+            except Exception:
+                continue
+        return gauges
+
+    def snapshot(self):
+        with self.lock:
+            gauges = self._gauges()
+            return {
+                "time": time.time(),
+                "counters": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in self.counters.items()],
+                "gauges": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in gauges.items()],
+                "histograms": [{"name": n, "labels": dict(l), "count": h.count, "sum": round(h.sum, 6),
+                                "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], h.counts))}
+                               for (n, l), h in self.histograms.items()],
+            }
+
+    def prometheus_text(self):
+        # Prometheus text exposition format (version 0.0.4)
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            gauges = self._gauges()
+            for (name, labels), value in sorted(self.counters.items()):
+                header(name, "counter")
+                lines.append(f"{_series(name, labels)} {value}")
+            for (name, labels), value in sorted(gauges.items()):
+                header(name, "gauge")
+                lines.append(f"{_series(name, labels)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                header(name, "histogram")
+                cumulative = 0
+                for bound, count in zip([str(b) for b in BUCKETS] + ["+Inf"], histogram.counts):
+                    cumulative += count
+                    lines.append(f"{_series(name + '_bucket', labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{_series(name + '_sum', labels)} {histogram.sum}")
+                lines.append(f"{_series(name + '_count', labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter:
+    # Serves registry.prometheus_text() at http://host:port/metrics from a background thread
+    def __init__(self, registry, port=9108, host="0.0.0.0"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.prometheus_text().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class JsonFileExporter:
+    # Rewrites path with registry.snapshot() every interval seconds (and once more on close); the file is
+    # replaced atomically, so readers never see a half-written snapshot
+    def __init__(self, registry, path="tracker_metrics.json", interval=10.0):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-json", daemon=True)
+        self.thread.start()
+
+    def write(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.registry.snapshot(), f, indent=2)
+        os.replace(tmp, self.path)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"⚠️ Could not write metrics to {self.path}: {e}")
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        self.write()
@@ -0,0 +1,157 @@
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from metrics import NULL_METRICS
+
+DONE = object()
+
+
+class StageStats:
+    # Per-item latencies are kept for the last `samples` items only, so long runs stay bounded
+    def __init__(self, name, samples=100_000):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.wall = 0.0
+        self.latencies = deque(maxlen=samples)
+
+    def add(self, seconds):
+        self.items += 1
+        self.busy += seconds
+        self.latencies.append(seconds)
+
+    def percentiles(self, qs=(50, 95, 99)):
+        if not self.latencies:
+            return {f'p{q}_ms': 0.0 for q in qs}
+        values = np.percentile(np.fromiter(self.latencies, dtype=float), qs) * 1e3
+        return {f'p{q}_ms': round(float(v), 3) for q, v in zip(qs, values)}
+
+    @property
+    def fps(self):
+        return self.items / self.busy if self.busy else 0.0
+
+    @property
+    def utilization(self):
+        return self.busy / self.wall if self.wall else 0.0
+
+    def as_dict(self):
+        return {'stage': self.name, 'items': self.items, 'busy_s': round(self.busy, 3),
+                'fps': round(self.fps, 2), 'utilization': round(self.utilization, 3), **self.percentiles()}
+
+
+class Stage(threading.Thread):
+    # Worker thread that applies func to every item from inbox and forwards the result.
+    # Returning None from func drops the item.
+    def __init__(self, name, func, inbox, outbox, pipeline):
+        super().__init__(name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.pipeline = pipeline
+        self.stats = StageStats(name)
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            while True:
+                item = self.inbox.get()
+                if item is DONE:
+                    break
+                t0 = time.perf_counter()
+                result = self.func(item)
+                elapsed = time.perf_counter() - t0
+                self.stats.add(elapsed)
+                self.pipeline.metrics.observe('tracker_stage_seconds', elapsed, stage=self.name)
+                if result is not None and self.outbox is not None:
+                    self.outbox.put(result)
+        except BaseException as e:
+            self.pipeline.fail(e)
+            # Keep draining so upstream stages never block on a full queue
+            while self.inbox.get() is not DONE:
+                pass
+        finally:
+            self.stats.wall = time.perf_counter() - start
+            if self.outbox is not None:
+                self.outbox.put(DONE)
+
+
+class SourceStage(threading.Thread):
+    def __init__(self, name, source, outbox, pipeline):
+        super().__init__(name=name, daemon=True)
+        self.source = source
+        self.outbox = outbox
+        self.pipeline = pipeline
+        self.stats = StageStats(name)
+
+    def run(self):
+        start = time.perf_counter()
+        try:
+            iterator = iter(self.source)
+            while not self.pipeline.stopped.is_set():
+                t0 = time.perf_counter()
+                item = next(iterator, DONE)
+                elapsed = time.perf_counter() - t0
+                if item is DONE:
+                    self.stats.busy += elapsed
+                    break
+                self.stats.add(elapsed)
+                self.pipeline.metrics.observe('tracker_stage_seconds', elapsed, stage=self.name)
+                self.outbox.put(item)
+        except BaseException as e:
+            self.pipeline.fail(e)
+        finally:
+            self.stats.wall = time.perf_counter() - start
+            self.outbox.put(DONE)
+
+
+class Pipeline:
+    # Runs a source and a chain of stages on separate threads connected by bounded queues.
+    # The queue bound gives backpressure: a slow stage stalls the ones before it instead of buffering frames.
+    def __init__(self, source, stages, maxsize=8, source_name='decode', metrics=NULL_METRICS):
+        self.stopped = threading.Event()
+        self.errors = []
+        self.metrics = metrics
+        self.queues = [queue.Queue(maxsize=maxsize) for _ in stages]
+        # A full queue in front of a stage means that stage is the one holding the pipeline back
+        for (name, _), q in zip(stages, self.queues):
+            metrics.gauge_fn('tracker_queue_depth', q.qsize, stage=name)
+        self.threads = [SourceStage(source_name, source, self.queues[0], self)]
+        for i, (name, func) in enumerate(stages):
+            outbox = self.queues[i + 1] if i + 1 < len(stages) else None
+            self.threads.append(Stage(name, func, self.queues[i], outbox, self))
+
+    def fail(self, error):
+        self.errors.append(error)
+        self.stopped.set()
+
+    def stop(self):
+        self.stopped.set()
+
+    def queue_depths(self):
+        return [q.qsize() for q in self.queues]
+
+    @property
+    def stats(self):
+        return [t.stats for t in self.threads]
+
+    def run(self):
+        for t in self.threads:
+            t.start()
+        for t in self.threads:
+            t.join()
+        if self.errors:
+            raise self.errors[0]
+        return self.stats
+
+    def report(self):
+        stats = self.stats
+        slowest = max(stats, key=lambda s: s.busy / s.items if s.items else 0.0)
+        for s in stats:
+            marker = '  <- slowest' if s is slowest else ''
+            p = s.percentiles()
+            print(f"{s.name:>10}: {s.items:>7} items  {s.fps:>8.1f} fps  {s.utilization:>6.1%} busy  "
+                  f"p50 {p['p50_ms']:.1f} / p95 {p['p95_ms']:.1f} ms{marker}")
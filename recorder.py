@@ -0,0 +1,77 @@
+import os
+from collections import deque
+
+import cv2
+
+RENDER_MODES = ('full', 'sampled', 'events', 'none')
+
+
+class FrameRecorder:
+    # Decides which frames get annotated and encoded:
+    #   full    - every frame, as before
+    #   sampled - every sample_every-th frame
+    #   events  - short clips around zone entries / component assignments, one file per clip
+    #   none    - nothing is drawn or encoded
+    def __init__(self, source, output_path, annotate, mode='full', sample_every=25, clip_seconds=2.0):
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode: {mode}")
+        self.source = source
+        self.output_path = output_path
+        self.annotate = annotate
+        self.mode = mode
+        self.sample_every = max(1, sample_every)
+        self.clip_frames = max(1, int(round(clip_seconds * (source.fps or 25))))
+        self.pre_roll = deque(maxlen=self.clip_frames)
+        self.post_roll = 0
+        self.writer = None
+        self.clips = 0
+
+        if mode == 'full':
+            self.writer = source.open_writer(output_path)
+        elif mode == 'sampled':
+            fps = (source.fps or 25) / self.sample_every
+            self.writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps,
+                                          (source.width, source.height))
+
+    @property
+    def enabled(self):
+        return self.mode != 'none'
+
+    def record(self, frame_idx, frame, detections, events=0):
+        if self.mode == 'full':
+            self.write(frame, detections)
+        elif self.mode == 'sampled':
+            if frame_idx % self.sample_every == 0:
+                self.write(frame, detections)
+        elif self.mode == 'events':
+            self.record_event_clip(frame_idx, frame, detections, events)
+
+    def record_event_clip(self, frame_idx, frame, detections, events):
+        if events and self.writer is None:
+            stem, ext = os.path.splitext(self.output_path)
+            self.writer = self.source.open_writer(f"{stem}_{frame_idx:06d}{ext or '.mp4'}")
+            self.clips += 1
+            while self.pre_roll:
+                self.write(*self.pre_roll.popleft())
+        if events:
+            self.post_roll = self.clip_frames
+
+        if self.writer is None:
+            self.pre_roll.append((frame, detections))
+            return
+        self.write(frame, detections)
+        self.post_roll -= 1
+        if self.post_roll <= 0:
+            self.writer.release()
+            self.writer = None
+
+    def write(self, frame, detections):
+        if len(detections[1]):
+            self.annotate(frame, *detections)
+        self.writer.write(frame)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        self.pre_roll.clear()
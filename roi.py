@@ -0,0 +1,51 @@
+import math
+
+import numpy as np
+
+
+class RegionOfInterest:
+    # Axis-aligned crop around the worker zones and the middle line. The detector only sees the crop;
+    # its boxes are shifted back to full-frame coordinates before the ComponentTracker uses them.
+    def __init__(self, x1, y1, x2, y2, frame_width, frame_height):
+        self.x1, self.y1, self.x2, self.y2 = x1, y1, x2, y2
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+
+    @classmethod
+    def from_zones(cls, worker_zones, middle_line, margin, frame_width, frame_height):
+        points = [point for zone in worker_zones for point in zone] + list(middle_line)
+        xs = [x for x, _ in points]
+        ys = [y for _, y in points]
+        x1 = max(0, min(xs) - margin)
+        y1 = max(0, min(ys) - margin)
+        x2 = min(frame_width, max(xs) + margin)
+        y2 = min(frame_height, max(ys) + margin)
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError("Worker zones / middle line lie outside the frame")
+        return cls(x1, y1, x2, y2, frame_width, frame_height)
+
+    @property
+    def width(self):
+        return self.x2 - self.x1
+
+    @property
+    def height(self):
+        return self.y2 - self.y1
+
+    @property
+    def area_share(self):
+        return self.width * self.height / (self.frame_width * self.frame_height)
+
+    def crop(self, frame):
+        # A view, not a copy
+        return frame[self.y1:self.y2, self.x1:self.x2]
+
+    def to_frame(self, xyxy):
+        return xyxy + np.array([self.x1, self.y1, self.x1, self.y1], dtype=xyxy.dtype)
+
+    def imgsz(self, base=640, stride=32):
+        # Inference size that keeps objects at the scale full-frame inference at `base` would see them,
+        # so the saving is in pixels, not in detection quality
+        scale = base / max(self.frame_width, self.frame_height)
+        side = max(self.width, self.height) * scale
+        return max(stride, int(math.ceil(side / stride)) * stride)
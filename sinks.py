@@ -0,0 +1,286 @@
+import json
+import math
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+_STOP = object()
+
+
+# Row key per table: a box / component is written once per output
+KEYS = {'boxes': 'box_id', 'components': 'component_id'}
+
+
+def _first_rows(table, frame, written):
+    # Drops rows whose key was already written (or repeats within the frame) and records the rest
+    key = KEYS[table]
+    if key in frame:
+        fresh = ~frame[key].isin(written) & ~frame[key].duplicated()
+        if not fresh.all():
+            frame = frame[fresh]
+        written.update(frame[key].tolist())
+    return frame
+
+
+class CsvSink:
+    # Appends flushed tracker rows to boxes.csv / main_components.csv, writing the header once. Rows whose
+    # key was already written are dropped (first one wins, like save_to_csv's drop_duplicates), so a spool
+    # replayed after a crash never duplicates rows in the CSV.
+    def __init__(self, boxes_path='boxes.csv', components_path='main_components.csv'):
+        self.paths = {'boxes': boxes_path, 'components': components_path}
+        self.output = 'csv:' + ','.join(os.path.abspath(path) for path in self.paths.values())
+        self.started = set()
+        self.written = {table: set() for table in self.paths}
+
+    def resume(self):
+        # Continue the files of a run that crashed with rows still spooled, instead of starting new ones
+        for table, path in self.paths.items():
+            if os.path.exists(path) and os.path.getsize(path):
+                self.written[table].update(pd.read_csv(path, usecols=[KEYS[table]])[KEYS[table]].tolist())
+                self.started.add(table)
+
+    def write(self, table, frame):
+        first = table not in self.started
+        frame = _first_rows(table, frame, self.written[table])
+        if frame.empty and not first:
+            return
+        frame.to_csv(self.paths[table], mode='w' if first else 'a', header=first, index=False)
+        self.started.add(table)
+
+    def close(self):
+        pass
+
+
+class EventLogSink:
+    # Writes flushed tracker rows to fixed-width binary logs (see event_log) instead of text CSV. Like CsvSink,
+    # a run replaces the previous logs unless append is set (or a spool is replayed, see resume), and a key
+    # is written once per output.
+    def __init__(self, boxes_path='boxes.trk', components_path='main_components.trk', append=False):
+        self.paths = {'boxes': boxes_path, 'components': components_path}
+        self.output = 'trk:' + ','.join(os.path.abspath(path) for path in self.paths.values())
+        self.append = False
+        self.writers = {}
+        self.written = {table: set() for table in self.paths}
+        if append:
+            self.resume()
+
+    def resume(self):
+        # Continue the existing logs, skipping keys they already hold
+        from event_log import open_log
+        self.append = True
+        for table, path in self.paths.items():
+            if os.path.exists(path) and os.path.getsize(path):
+                existing, records = open_log(path)
+                if existing != table:
+                    raise ValueError(f"{path} is a {existing} log, not {table}")
+                self.written[table].update(records[KEYS[table]].tolist())
+
+    def _writer(self, table):
+        # Opened on first use, so a replayed spool can switch to append before anything is truncated
+        from event_log import EventLogWriter
+        if table not in self.writers:
+            self.writers[table] = EventLogWriter(self.paths[table], table, self.append)
+        return self.writers[table]
+
+    def write(self, table, frame):
+        self._writer(table).write(_first_rows(table, frame, self.written[table]))
+
+    def close(self):
+        for table in self.paths:
+            self._writer(table).close()
+
+
+class DbSink:
+    # Upserts flushed tracker rows through a BulkWriter. Writes are keyed MERGEs, so writing
+    # the same rows twice (e.g. a spool replay after a crash) leaves the tables unchanged.
+    def __init__(self, pool=None, backend=None, tables=None, chunk_size=10_000):
+        from db_pool import get_pool
+        from db_writer import SqlServerBackend, TRACKER_TABLES
+        self.pool = pool or get_pool()
+        self.backend = backend or SqlServerBackend
+        self.tables = tables or TRACKER_TABLES
+        self.chunk_size = chunk_size
+        self.output = 'db:' + ','.join(target for target, _, _, _ in self.tables.values())
+
+    def write(self, table, frame):
+        from db_writer import BulkWriter
+        if frame.empty:
+            return
+        target, columns, key, mapping = self.tables[table]
+        writer = BulkWriter(chunk_size=self.chunk_size)
+        writer.register(target, columns, key)
+        writer.add_frame(target, frame, mapping)
+        self.pool.run(lambda conn: writer.flush(self.backend(conn)))
+
+    def close(self):
+        pass
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict) and '$dt' in value:
+        return datetime.fromisoformat(value['$dt'])
+    return value
+
+
+class Spool:
+    # Append-only JSONL file of batches the target could not take. A batch line is followed by an
+    # ack line once it has been delivered; replay skips acked batches and the file is emptied when
+    # nothing is left outstanding. Every batch names the output it was meant for.
+    def __init__(self, path):
+        self.path = path
+        self.next_batch = 0
+        self.unacked = OrderedDict()
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from a crash mid-write
+                if 'ack' in record:
+                    self.unacked.pop(record['ack'], None)
+                else:
+                    self.unacked[record['batch']] = record
+                    self.next_batch = max(self.next_batch, record['batch'] + 1)
+        if not self.unacked:
+            os.remove(self.path)
+            self.next_batch = 0
+
+    def _append(self, record):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def outputs(self):
+        return {record.get('output') for record in self.unacked.values()}
+
+    def put(self, table, frame, output=None):
+        record = {'batch': self.next_batch, 'table': table, 'output': output, 'columns': list(frame.columns),
+                  'rows': [[_encode(v) for v in row] for row in frame.itertuples(index=False, name=None)]}
+        self._append(record)
+        self.unacked[record['batch']] = record
+        self.next_batch += 1
+
+    def __len__(self):
+        return len(self.unacked)
+
+    def replay(self, target):
+        # Delivers outstanding batches in order; stops (and raises) at the first failure
+        for batch, record in list(self.unacked.items()):
+            rows = [[_decode(v) for v in row] for row in record['rows']]
+            target.write(record['table'], pd.DataFrame(rows, columns=record['columns'], dtype=object))
+            self._append({'ack': batch})
+            del self.unacked[batch]
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.next_batch = 0
+
+
+class WriteBehindSink:
+    # Takes tracker flushes off the hot loop: write() only enqueues, a background thread coalesces
+    # them into micro-batches (max_rows or max_delay seconds, whichever comes first) and hands them
+    # to the target sink. When the target fails, batches go to the local spool instead and are
+    # replayed, in order, once the target is reachable again (checked every retry_interval seconds)
+    # or on the next start. A spool left behind for a different output is refused rather than replayed
+    # into this one; one left for this output means the previous run's files are continued, not replaced.
+    def __init__(self, target, spool_path='tracker_spool.jsonl', max_rows=500, max_delay=2.0, retry_interval=30.0):
+        self.target = target
+        self.output = getattr(target, 'output', None)
+        self.spool = Spool(spool_path)
+        foreign = self.spool.outputs() - {None, self.output}
+        if self.output is not None and foreign:
+            raise ValueError(f"{spool_path} holds undelivered batches for {', '.join(sorted(foreign))}; deliver "
+                             f"them there or move the spool away before writing to {self.output}")
+        if len(self.spool) and hasattr(target, 'resume'):
+            target.resume()
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.retry_interval = retry_interval
+        self.queue = queue.Queue()
+        self.last_retry = float('-inf')
+        self.delivered = 0
+        self.spooled = 0
+        self.thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+        self.thread.start()
+
+    def write(self, table, frame):
+        self.queue.put((table, frame))
+
+    def close(self):
+        self.queue.put(_STOP)
+        self.thread.join()
+        self.target.close()
+
+    def _run(self):
+        pending = OrderedDict()
+        rows = 0
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._deliver(pending, retry=True)
+                return
+            if item is not None:
+                table, frame = item
+                pending.setdefault(table, []).append(frame)
+                rows += len(frame)
+                if deadline is None:
+                    deadline = time.monotonic() + self.max_delay
+            if rows >= self.max_rows or (deadline is not None and time.monotonic() >= deadline):
+                self._deliver(pending)
+                pending = OrderedDict()
+                rows = 0
+                deadline = None
+
+    def _deliver(self, pending, retry=False):
+        if len(self.spool) and (retry or time.monotonic() - self.last_retry >= self.retry_interval):
+            self.last_retry = time.monotonic()
+            try:
+                self.spool.replay(self.target)
+            except Exception as e:
+                print(f"⚠️ Output still unreachable, {len(self.spool)} batches spooled: {e}")
+
+        for table, frames in pending.items():
+            frame = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+            if len(self.spool):
+                # Keep ordering: nothing bypasses batches that are still waiting in the spool
+                if not frame.empty:
+                    self.spool.put(table, frame, self.output)
+                    self.spooled += len(frame)
+                continue
+            try:
+                self.target.write(table, frame)
+                self.delivered += len(frame)
+            except Exception as e:
+                print(f"⚠️ Output write failed, spooling {len(frame)} {table} rows to {self.spool.path}: {e}")
+                self.spool.put(table, frame, self.output)
+                self.spooled += len(frame)
+                self.last_retry = time.monotonic()
@@ -1,32 +1,16 @@
 from ultralytics import YOLO
 import cv2
+from frame_source import FrameSource, track_frames
 
 model = YOLO("runs/detect/train5/weights/best.pt")
 
-results = model.track(
-    source="second_run_right.mp4",
-    show=False,
-    stream=True,
-    tracker="botsort.yaml",
-    conf=0.5
-)
-
-# Load original video for reading frames
-cap = cv2.VideoCapture("second_run_right.mp4")
-frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-fps = cap.get(cv2.CAP_PROP_FPS)
+# Decode the video once and share each frame between the tracker and the writer
+source = FrameSource("second_run_right.mp4")
 
 # Create output video writer
-out = cv2.VideoWriter("output_tracked.mp4", cv2.VideoWriter_fourcc(*'mp4v'), fps, (frame_width, frame_height))
-
-frame_id = 0
-
-for result in results:
-    success, frame = cap.read()
-    if not success:
-        break
+out = source.open_writer("output_tracked.mp4")
 
+for frame_id, frame, result in track_frames(model, source, tracker="botsort.yaml", conf=0.5):
     if result.boxes is not None:
         for box in result.boxes:
             cls = int(box.cls[0].item())
@@ -41,7 +25,6 @@ for result in results:
             cv2.putText(frame, f"ID:{id}", (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
 
     out.write(frame)
-    frame_id += 1
 
-cap.release()
+source.release()
 out.release()
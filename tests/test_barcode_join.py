@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from barcode_join import BarcodeJoiner, follow_csv, join_streams, read_chunks
+from bench_suite import synthetic_detections
+from sinks import CsvSink
+from TrackerSystem import ComponentTracker
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "zone_setup.json")
+FRAMES = 4000
+
+
+def tracker_output(tmp_path):
+    # boxes.csv / main_components.csv as run_tracking writes them: evicted tracks flushed through a sink
+    paths = str(tmp_path / "boxes.csv"), str(tmp_path / "main_components.csv")
+    tracker = ComponentTracker(CONFIG, track_ttl=60, dedup_window=600, sink=CsvSink(*paths), flush_rows=50,
+                               flush_interval=1)
+    bounds, cls, ids, xyxy, times = synthetic_detections(CONFIG, FRAMES)
+    for i in range(FRAMES):
+        lo, hi = bounds[i], bounds[i + 1]
+        tracker.expire(times[i])
+        tracker.update_frame(cls[lo:hi], ids[lo:hi], xyxy[lo:hi], times[i])
+    tracker.save_to_csv()
+    return paths
+
+
+def read(path, size=40):
+    return list(read_chunks(path, ["first_detected", "zone_entry_time"], chunksize=size))
+
+
+def scans(boxes, components):
+    # One read 50 ms after every box and component is first seen
+    times = pd.concat([boxes["first_detected"], components["first_detected"]])
+    times = pd.to_datetime(times).sort_values() + pd.Timedelta(milliseconds=50)
+    return pd.DataFrame({"barcode_id": np.arange(len(times)), "barcode": [f"{i:012d}" for i in range(len(times))],
+                         "time_of_detection": times.to_numpy()})
+
+
+def evicted_order(frame, rng, max_delay=45.0):
+    # Rows leave the tracker when their track expires, up to max_delay seconds after first_detected
+    leaves = pd.to_datetime(frame["first_detected"]) + pd.to_timedelta(rng.uniform(0, max_delay, len(frame)), unit="s")
+    return frame.iloc[np.argsort(leaves.to_numpy(), kind="stable")]
+
+
+def chunks(frame, size=40):
+    return [frame.iloc[i:i + size].reset_index(drop=True) for i in range(0, len(frame), size)]
+
+
+def join(boxes, components, reads, lateness):
+    # Boxes are scanned at first_detected too, so a row arriving late has no slack before its read goes stale
+    joiner = BarcodeJoiner(tolerance=5.0)
+    for _ in join_streams(joiner, boxes, components, chunks(reads), box_time="first_detected", lateness=lateness):
+        pass
+    return joiner.stats()
+
+
+def test_tracker_csv_output_joins_without_lateness(tmp_path):
+    boxes_path, components_path = tracker_output(tmp_path)
+    boxes, components = read(boxes_path), read(components_path)
+    reads = scans(pd.concat(boxes), pd.concat(components))
+    stats = join(boxes, components, reads, lateness=0.0)
+    assert stats["matched"] == len(reads)
+    assert stats["unmatched_reads"] == 0 and stats["late_entities"] == 0
+
+
+def test_out_of_order_rows_within_lateness_still_match(tmp_path):
+    boxes_path, components_path = tracker_output(tmp_path)
+    boxes, components = pd.concat(read(boxes_path)), pd.concat(read(components_path))
+    reads = scans(boxes, components)
+    rng = np.random.default_rng(0)
+    boxes, components = chunks(evicted_order(boxes, rng)), chunks(evicted_order(components, rng))
+
+    stats = join(boxes, components, reads, lateness=60.0)
+    assert stats["matched"] == len(reads)
+    assert stats["unmatched_reads"] == 0 and stats["late_entities"] == 0
+
+    # Without the lateness bound the same input loses reads, and says so
+    stats = join(boxes, components, reads, lateness=0.0)
+    assert stats["unmatched_reads"] > 0 and stats["late_entities"] > 0
+
+
+def test_follow_tails_growing_tracker_output(tmp_path):
+    boxes_path, components_path = tracker_output(tmp_path)
+    boxes, components = pd.concat(read(boxes_path)), pd.concat(read(components_path))
+    reads = scans(boxes, components)
+    reads_path = str(tmp_path / "reads.csv")
+    reads.to_csv(reads_path, index=False)
+
+    # Replay the tracker output into new files a few rows at a time, as a running tracker would
+    live = {path: str(tmp_path / ("live_" + os.path.basename(path))) for path in (boxes_path, components_path)}
+
+    def grow():
+        sources = {path: open(path).readlines() for path in live}
+        files = {path: open(target, "w") for path, target in live.items()}
+        for start in range(0, max(map(len, sources.values())), 100):
+            for path, lines in sources.items():
+                files[path].writelines(lines[start:start + 100])
+                files[path].flush()
+            time.sleep(0.01)
+        for f in files.values():
+            f.close()
+
+    writer = threading.Thread(target=grow)
+    writer.start()
+    joiner = BarcodeJoiner(tolerance=5.0)
+    times = ["first_detected", "zone_entry_time"]
+    out = list(join_streams(joiner, follow_csv(live[boxes_path], times, 0.01, idle_timeout=0.5),
+                            follow_csv(live[components_path], times, 0.01, idle_timeout=0.5),
+                            follow_csv(reads_path, ["time_of_detection"], 0.01, idle_timeout=0.5),
+                            box_time="first_detected"))
+    writer.join()
+    stats = joiner.stats()
+    assert stats["matched"] == len(reads) == len(boxes) + len(components)
+    # Records came out while the files were still growing, not only at the end
+    assert len(out) > 2
@@ -0,0 +1,67 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from db_writer import BulkWriter, SqliteBackend
+
+T0 = datetime(2025, 6, 15, 8, 0)
+T1 = datetime(2025, 6, 15, 9, 0)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE Boxes (UniqueID INTEGER PRIMARY KEY, TimeAtLocation1 TEXT)")
+    yield conn
+    conn.close()
+
+
+def writer(conn, update, chunk_size=10_000):
+    writer = BulkWriter(SqliteBackend(conn), chunk_size=chunk_size)
+    writer.register("Boxes", ["UniqueID", "TimeAtLocation1"], key="UniqueID", update=update)
+    return writer
+
+
+def rows(conn):
+    return conn.execute("SELECT UniqueID, TimeAtLocation1 FROM Boxes ORDER BY UniqueID").fetchall()
+
+
+def test_insert_only_keeps_the_first_sighting(conn):
+    w = writer(conn, update=False)
+    w.add("Boxes", (1, T0))
+    w.add("Boxes", (1, T1))
+    w.flush()
+    w.add("Boxes", (1, T1))
+    w.add("Boxes", (2, T1))
+    w.flush()
+    assert rows(conn) == [(1, str(T0)), (2, str(T1))]
+    assert w.pending_rows() == 0
+
+
+def test_upsert_updates_existing_rows(conn):
+    w = writer(conn, update=True)
+    w.add("Boxes", {"UniqueID": 1, "TimeAtLocation1": T0})
+    w.flush()
+    w.add("Boxes", {"UniqueID": 1, "TimeAtLocation1": T1})
+    w.flush()
+    assert rows(conn) == [(1, str(T1))]
+
+
+def test_rows_are_written_in_chunks(conn):
+    w = writer(conn, update=False, chunk_size=3)
+    for box_id in range(10):
+        w.add("Boxes", (box_id, None))
+    w.flush()
+    assert [box_id for box_id, _ in rows(conn)] == list(range(10))
+
+
+def test_failed_flush_rolls_back_and_keeps_rows(conn):
+    w = writer(conn, update=False)
+    w.register("Missing", ["UniqueID"], key="UniqueID")
+    w.add("Boxes", (1, T0))
+    w.add("Missing", (1,))
+    with pytest.raises(sqlite3.OperationalError):
+        w.flush()
+    assert rows(conn) == []
+    assert w.pending_rows() == 2
@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from event_log import EventLogWriter, read_log
+from sinks import EventLogSink
+
+T0 = datetime(2025, 6, 15, 8, 0)
+
+
+def boxes(*ids):
+    return pd.DataFrame({'box_id': list(ids), 'first_detected': [T0] * len(ids),
+                         'zone_id': [0] * len(ids), 'zone_entry_time': [T0] * len(ids)})
+
+
+def run(tmp_path, ids, append=False):
+    sink = EventLogSink(str(tmp_path / "boxes.trk"), str(tmp_path / "main_components.trk"), append=append)
+    sink.write('boxes', boxes(*ids))
+    sink.close()
+
+
+def test_new_run_replaces_previous_log(tmp_path):
+    run(tmp_path, [1, 2, 3])
+    run(tmp_path, [4, 5])
+    assert read_log(tmp_path / "boxes.trk")['box_id'].tolist() == [4, 5]
+
+
+def test_append_keeps_previous_records(tmp_path):
+    run(tmp_path, [1, 2, 3])
+    run(tmp_path, [4, 5], append=True)
+    assert read_log(tmp_path / "boxes.trk")['box_id'].tolist() == [1, 2, 3, 4, 5]
+
+
+def test_append_to_other_table_is_refused(tmp_path):
+    run(tmp_path, [1])
+    with pytest.raises(ValueError, match="boxes log"):
+        EventLogWriter(str(tmp_path / "boxes.trk"), "components", append=True)
+
+
+def test_repeated_keys_are_written_once(tmp_path):
+    sink = EventLogSink(str(tmp_path / "boxes.trk"), str(tmp_path / "main_components.trk"))
+    sink.write('boxes', boxes(1, 2, 2))
+    sink.write('boxes', boxes(2, 3))
+    sink.close()
+    assert read_log(tmp_path / "boxes.trk")['box_id'].tolist() == [1, 2, 3]
+
+
+def test_append_skips_keys_already_in_the_log(tmp_path):
+    run(tmp_path, [1, 2, 3])
+    run(tmp_path, [3, 4], append=True)
+    assert read_log(tmp_path / "boxes.trk")['box_id'].tolist() == [1, 2, 3, 4]
+
+
+def test_spool_replay_continues_the_log(tmp_path):
+    from sinks import Spool, WriteBehindSink
+    paths = (str(tmp_path / "boxes.trk"), str(tmp_path / "main_components.trk"))
+    spool_path = str(tmp_path / "spool.jsonl")
+    run(tmp_path, [1, 2, 3])
+    # The crashed run delivered 1-3 but left 3-5 spooled (3 was delivered before its ack was written)
+    Spool(spool_path).put('boxes', boxes(3, 4, 5), EventLogSink(*paths).output)
+
+    sink = WriteBehindSink(EventLogSink(*paths), spool_path)
+    sink.write('boxes', boxes(100))
+    sink.close()
+    assert read_log(tmp_path / "boxes.trk")['box_id'].tolist() == [1, 2, 3, 4, 5, 100]
@@ -0,0 +1,23 @@
+from inference_scheduler import BatchScheduler
+
+
+class RecordingModel:
+    # Stands in for the detector: returns the frames and records each predict call's batch and imgsz
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, frames, verbose=False, **kwargs):
+        self.calls.append((list(frames), kwargs.get('imgsz')))
+        return list(frames)
+
+
+def test_stream_imgsz_reaches_predict():
+    model = RecordingModel()
+    scheduler = BatchScheduler(model, batch_size=8, max_wait=0.5, imgsz=640)
+    scheduler._track = lambda stream_id, result: result
+    futures = [scheduler.submit('cam1', 0, 'a', imgsz=320), scheduler.submit('cam2', 0, 'b'),
+               scheduler.submit('cam1', 1, 'c', imgsz=320)]
+    with scheduler:
+        assert [f.result() for f in futures] == ['a', 'b', 'c']
+    # Frames with different inference sizes are never predicted together
+    assert sorted(model.calls) == [(['a', 'c'], 320), (['b'], 640)]
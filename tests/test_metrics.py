@@ -0,0 +1,29 @@
+import os
+from datetime import datetime
+
+from metrics import NULL_METRICS, MetricsRegistry
+from TrackerSystem import ComponentTracker
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "zone_setup.json")
+T0 = datetime(2025, 6, 15, 8, 0)
+
+
+def test_streams_sharing_a_registry_keep_their_own_series():
+    registry = MetricsRegistry()
+    trackers = {source: ComponentTracker(CONFIG, metrics=registry.with_labels(source=source))
+                for source in ("cam1", "cam2")}
+    for box_id in range(3):
+        trackers["cam1"].update_boxes(box_id, (0, 0, 10, 10), (5, 5), T0)
+    trackers["cam2"].update_boxes(0, (0, 0, 10, 10), (5, 5), T0)
+    trackers["cam2"].assign_component(0, T0, (5, 5))
+
+    gauges = {g["labels"]["source"]: g["value"] for g in registry.snapshot()["gauges"]
+              if g["name"] == "tracker_active_tracks"}
+    assert gauges == {"cam1": 3, "cam2": 1}
+    counters = registry.snapshot()["counters"]
+    assert [c["labels"]["source"] for c in counters if c["name"] == "tracker_components_total"] == ["cam2"]
+    assert 'tracker_active_tracks{source="cam1"} 3' in registry.prometheus_text()
+
+
+def test_null_metrics_stay_null_with_labels():
+    assert NULL_METRICS.with_labels(source="cam1") is NULL_METRICS
@@ -0,0 +1,120 @@
+import time
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from sinks import CsvSink, Spool, WriteBehindSink
+
+T0 = datetime(2025, 6, 15, 8, 0)
+
+
+class FailingSink:
+    def __init__(self, output):
+        self.output = output
+
+    def write(self, table, frame):
+        raise ConnectionError("output down")
+
+    def close(self):
+        pass
+
+
+class FlakySink:
+    # A CSV output that can be taken down mid-run
+    def __init__(self, target):
+        self.target = target
+        self.output = target.output
+        self.down = False
+
+    def write(self, table, frame):
+        if self.down:
+            raise ConnectionError("output down")
+        self.target.write(table, frame)
+
+    def close(self):
+        self.target.close()
+
+
+def wait_for(condition):
+    for _ in range(500):
+        if condition():
+            return
+        time.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def boxes(*ids):
+    return pd.DataFrame({'box_id': list(ids), 'first_detected': [T0] * len(ids),
+                         'zone_id': [None] * len(ids), 'zone_entry_time': [None] * len(ids)})
+
+
+def csv_sink(tmp_path):
+    return CsvSink(str(tmp_path / "boxes.csv"), str(tmp_path / "main_components.csv"))
+
+
+def test_restart_replays_spool_into_csv_without_duplicates(tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    # First run: the output is down, the batch is spooled and the process dies without close()
+    crashed = WriteBehindSink(FailingSink(csv_sink(tmp_path).output), spool, max_delay=0.01)
+    crashed.write('boxes', boxes(1, 2))
+    wait_for(lambda: crashed.spooled)
+    assert len(Spool(spool)) == 1
+
+    # Restart: the run produces the same rows again, and the spool is replayed on close
+    sink = WriteBehindSink(csv_sink(tmp_path), spool)
+    sink.write('boxes', boxes(1, 2, 3))
+    sink.close()
+
+    written = pd.read_csv(tmp_path / "boxes.csv")
+    assert written['box_id'].tolist() == [1, 2, 3]
+    assert not (tmp_path / "spool.jsonl").exists()
+
+
+def test_restart_keeps_rows_delivered_before_the_crash(tmp_path):
+    spool = str(tmp_path / "spool.jsonl")
+    # First run: rows 1-3 reach the CSV, then the output fails and 4-5 are spooled before the crash
+    flaky = FlakySink(csv_sink(tmp_path))
+    crashed = WriteBehindSink(flaky, spool, max_delay=0.01)
+    crashed.write('boxes', boxes(1, 2, 3))
+    wait_for(lambda: crashed.delivered)
+    flaky.down = True
+    crashed.write('boxes', boxes(4, 5))
+    wait_for(lambda: crashed.spooled)
+
+    # Second run only produces new rows; the first run's file is continued, not replaced
+    sink = WriteBehindSink(csv_sink(tmp_path), spool)
+    sink.write('boxes', boxes(100))
+    sink.close()
+
+    assert pd.read_csv(tmp_path / "boxes.csv")['box_id'].tolist() == [1, 2, 3, 4, 5, 100]
+
+
+def test_new_run_without_spool_replaces_the_csv(tmp_path):
+    for ids in ((1, 2, 3), (100,)):
+        sink = WriteBehindSink(csv_sink(tmp_path), str(tmp_path / "spool.jsonl"))
+        sink.write('boxes', boxes(*ids))
+        sink.close()
+    assert pd.read_csv(tmp_path / "boxes.csv")['box_id'].tolist() == [100]
+
+
+def test_crash_between_write_and_ack_does_not_duplicate_csv_rows(tmp_path):
+    spool_path = str(tmp_path / "spool.jsonl")
+    target = csv_sink(tmp_path)
+    spool = Spool(spool_path)
+    spool.put('boxes', boxes(1, 2), target.output)
+    # Delivered, but the process dies before the ack line is written
+    target.write('boxes', boxes(1, 2))
+
+    sink = WriteBehindSink(csv_sink(tmp_path), spool_path)
+    sink.write('boxes', boxes(2, 3))
+    sink.close()
+
+    assert pd.read_csv(tmp_path / "boxes.csv")['box_id'].tolist() == [1, 2, 3]
+
+
+def test_spool_for_another_output_is_refused(tmp_path):
+    spool = Spool(str(tmp_path / "spool.jsonl"))
+    spool.put('boxes', boxes(1), 'db:Boxes,Components')
+    with pytest.raises(ValueError, match="db:Boxes"):
+        WriteBehindSink(csv_sink(tmp_path), spool.path)
@@ -0,0 +1,97 @@
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from TrackerSystem import (ComponentTracker, box_area, box_centroids, boxes_in_zones, intersection_area, is_box_in_zone,
+                           line_sides, zone_overlap_ratios)
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "zone_setup.json")
+T0 = datetime(2025, 6, 15, 8, 0)
+
+
+def random_boxes(rng, n):
+    # Includes empty and inverted boxes (negative width / height)
+    xy = rng.integers(-100, 1300, size=(n, 2))
+    wh = rng.integers(-10, 400, size=(n, 2))
+    return np.concatenate([xy, xy + wh], axis=1)
+
+
+def test_batched_geometry_matches_reference():
+    rng = np.random.default_rng(0)
+    tracker = ComponentTracker(CONFIG)
+    boxes = random_boxes(rng, 5_000)
+
+    ratios = zone_overlap_ratios(boxes, tracker.zone_rects)
+    for box, row in zip(boxes.tolist(), ratios.tolist()):
+        for zone, ratio in zip(tracker.zone_rects, row):
+            area = box_area(box)
+            assert ratio == pytest.approx(intersection_area(box, zone) / area if area > 0 else 0.0)
+
+    in_zones = [[is_box_in_zone(box, zone) for zone in tracker.zone_rects] for box in boxes.tolist()]
+    assert boxes_in_zones(boxes, tracker.zone_rects).tolist() == in_zones
+
+    centroids = [((x1 + x2) // 2, (y1 + y2) // 2) for x1, y1, x2, y2 in boxes.tolist()]
+    assert box_centroids(boxes).tolist() == [list(c) for c in centroids]
+    assert line_sides(box_centroids(boxes), tracker.middle_line).tolist() == [tracker.get_side(c) for c in centroids]
+
+
+def random_stream(rng, frames=80):
+    # A few boxes and components wandering around the zones, each ID at most once per frame
+    stream = []
+    for _ in range(frames):
+        ids = np.concatenate([rng.choice(8, rng.integers(0, 4), replace=False),
+                              100 + rng.choice(40, rng.integers(0, 5), replace=False)])
+        cls = (ids >= 100).astype(int)
+        xy = rng.integers(200, 1000, size=(len(ids), 2))
+        xyxy = np.concatenate([xy, xy + rng.integers(20, 120, size=(len(ids), 2))], axis=1)
+        stream.append((cls, ids, xyxy))
+    return stream
+
+
+def per_detection_step(tracker, cls_ids, obj_ids, xyxy, timestamp):
+    # The tracking loop as it was before update_frame, one detection at a time with the reference helpers
+    for cls, obj_id, coords in zip(cls_ids.tolist(), obj_ids.tolist(), xyxy.tolist()):
+        coords = tuple(coords)
+        centroid = ((coords[0] + coords[2]) // 2, (coords[1] + coords[3]) // 2)
+        if cls == 0:
+            tracker.update_boxes(obj_id, coords, centroid, timestamp)
+            for zone_idx, zone in enumerate(tracker.worker_zones):
+                if is_box_in_zone(coords, tracker.zone_rects[zone_idx]):
+                    if tracker.zone_boxes[zone] != obj_id:
+                        tracker.update_box_zone(obj_id, zone_idx, timestamp)
+                    tracker.zone_boxes[zone] = obj_id
+        elif cls == 1:
+            tracker.assign_component(obj_id, timestamp, centroid)
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_update_frame_matches_per_detection_loop(seed):
+    stream = random_stream(np.random.default_rng(seed))
+    batched, reference = ComponentTracker(CONFIG), ComponentTracker(CONFIG)
+    for i, (cls, ids, xyxy) in enumerate(stream):
+        timestamp = T0 + timedelta(seconds=i / 25)
+        batched.update_frame(cls, ids, xyxy, timestamp)
+        per_detection_step(reference, cls, ids, xyxy, timestamp)
+
+    assert batched.boxes_df.equals(reference.boxes_df)
+    assert batched.components_df.equals(reference.components_df)
+    assert batched.event_count == reference.event_count
+
+
+def test_first_box_in_zone_is_the_oldest_member():
+    # Boxes keep entering, leaving and re-entering a zone, and some are evicted
+    rng = np.random.default_rng(0)
+    tracker = ComponentTracker(CONFIG)
+    zones = len(tracker.zone_rects)
+    for step in range(20_000):
+        box_id = int(rng.integers(300))
+        if box_id in tracker.boxes and rng.random() < 0.05:
+            tracker.evict_box(box_id)
+        else:
+            in_zones = (rng.random(zones) < 0.3).tolist()
+            tracker.update_boxes(box_id, (0, 0, 10, 10), (5, 5), T0 + timedelta(seconds=step), in_zones=in_zones)
+        for zone_idx, members in enumerate(tracker.zone_members):
+            oldest = min(members, key=lambda b: tracker.boxes[b]['order']) if members else None
+            assert tracker.first_box_in_zone(zone_idx) == oldest
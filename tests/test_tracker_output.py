@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from bench_suite import synthetic_detections
+from sinks import CsvSink
+from TrackerSystem import ComponentTracker
+
+CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "zone_setup.json")
+FRAMES = 3000
+
+
+def replay(tracker, stream, on_frame=None):
+    bounds, cls, ids, xyxy, times = stream
+    for i in range(FRAMES):
+        lo, hi = bounds[i], bounds[i + 1]
+        tracker.expire(times[i])
+        tracker.update_frame(cls[lo:hi], ids[lo:hi], xyxy[lo:hi], times[i])
+        if on_frame is not None:
+            on_frame(i)
+    tracker.save_to_csv()
+
+
+def test_sink_output_matches_save_to_csv(tmp_path, monkeypatch):
+    # Evicting and flushing through a sink writes the same rows, in the same order, as keeping everything
+    stream = synthetic_detections(CONFIG, FRAMES)
+    sink = CsvSink(str(tmp_path / "sink_boxes.csv"), str(tmp_path / "sink_components.csv"))
+    replay(ComponentTracker(CONFIG, track_ttl=60, dedup_window=600, sink=sink, flush_rows=50, flush_interval=1), stream)
+    monkeypatch.chdir(tmp_path)
+    replay(ComponentTracker(CONFIG, track_ttl=60, dedup_window=600), stream)
+
+    assert pd.read_csv("sink_boxes.csv").equals(pd.read_csv("boxes.csv"))
+    assert pd.read_csv("sink_components.csv").equals(pd.read_csv("main_components.csv"))
+
+
+def test_rows_waiting_for_barcodes_keep_their_order(tmp_path):
+    stream = synthetic_detections(CONFIG, FRAMES)
+    sink = CsvSink(str(tmp_path / "boxes.csv"), str(tmp_path / "main_components.csv"))
+    tracker = ComponentTracker(CONFIG, track_ttl=60, sink=sink, flush_rows=20, flush_interval=1, barcodes=True)
+
+    def settle_some(i):
+        # Reads come back out of order: every third component is settled a while after the rest
+        for c_id in sorted(tracker.barcode_pending):
+            if c_id % 3 or i % 500 == 0:
+                tracker.set_barcode(c_id, f"code-{c_id}")
+
+    replay(tracker, stream, settle_some)
+    components = pd.read_csv(tmp_path / "main_components.csv")
+    first_detected = pd.to_datetime(components["first_detected"], format="ISO8601")
+    assert first_detected.is_monotonic_increasing
+    assert components["component_id"].is_unique
+
+
+def test_long_lived_track_does_not_hold_back_output(tmp_path):
+    # One box stays in view for an hour while a new box (with one component) passes every 10 s
+    fps, seconds = 2, 3600
+    sink = CsvSink(str(tmp_path / "boxes.csv"), str(tmp_path / "main_components.csv"))
+    tracker = ComponentTracker(CONFIG, track_ttl=60, dedup_window=600, sink=sink, flush_interval=10, max_hold=300)
+    start = pd.Timestamp(2025, 6, 15, 8).to_pydatetime()
+    peak = 0
+    for i in range(fps * seconds):
+        now = start + pd.Timedelta(seconds=i / fps)
+        passing = i // (10 * fps) + 1
+        cls, ids, xyxy = [0], [0], [[300, 300, 400, 400]]
+        if i % (10 * fps) < 2 * fps:
+            cls += [0, 1]
+            ids += [passing, 10_000 + passing]
+            xyxy += [[800, 500, 900, 600], [850, 550, 870, 570]]
+        tracker.expire(now)
+        tracker.update_frame(np.array(cls), np.array(ids), np.array(xyxy), now)
+        peak = max(peak, len(tracker.box_events) + len(tracker.component_events))
+
+    # Rows older than max_hold were written while the long-lived box was still in view
+    assert peak < 2 * (300 + 60) // 10 + 10
+    assert len(pd.read_csv(tmp_path / "boxes.csv")) > 300
+    assert len(pd.read_csv(tmp_path / "main_components.csv")) > 300
+
+    tracker.save_to_csv()
+    boxes = pd.read_csv(tmp_path / "boxes.csv")["box_id"]
+    # Everything is written once, and only the long-lived box is out of first-detection order
+    assert sorted(boxes) == list(range(seconds // 10 + 1))
+    assert boxes[boxes != 0].is_monotonic_increasing
+    assert pd.read_csv(tmp_path / "main_components.csv")["component_id"].is_unique